@@ -1,11 +1,13 @@
 from .sharp_node import SharpnessAnalyzer, SharpFrameSelector
 from .parallel_loader import ParallelSharpnessLoader
+from .folder_loader import ParallelSharpnessFolderLoader
 from .fast_saver import FastAbsoluteSaver  # <--- Added this missing import
 
 NODE_CLASS_MAPPINGS = {
     "SharpnessAnalyzer": SharpnessAnalyzer,
     "SharpFrameSelector": SharpFrameSelector,
     "ParallelSharpnessLoader": ParallelSharpnessLoader,
+    "ParallelSharpnessFolderLoader": ParallelSharpnessFolderLoader,
     "FastAbsoluteSaver": FastAbsoluteSaver
 }
 
@@ -13,6 +15,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "SharpnessAnalyzer": "1. Sharpness Analyzer",
     "SharpFrameSelector": "2. Sharp Frame Selector",
     "ParallelSharpnessLoader": "3. Parallel Video Loader (Sharpness)",
+    "ParallelSharpnessFolderLoader": "4. Parallel Folder Loader (Sharpness)",
     "FastAbsoluteSaver": "Fast Absolute Saver (Metadata)"
 }
 
@@ -0,0 +1,331 @@
+"""Benchmark the nodes on synthetic videos: frames/s, latency and peak RSS per stage.
+
+Runs offline on CPU. Test videos are generated locally (bundled/system ffmpeg
+when available, so the GOP length is exact; cv2.VideoWriter otherwise) with a
+repeating blur pattern, so the sharpness ranking is known and stable.
+
+    python benchmarks/bench_nodes.py --out results.json
+    python benchmarks/bench_nodes.py --width 3840 --height 2160 --frames 600 --out 4k.json --compare results.json
+
+Results are JSON: one record per stage and variant, plus the machine and video
+settings they were taken with. Without --out the report is the only thing
+written to stdout; progress (and the nodes' own log lines) go to stderr:
+
+    python benchmarks/bench_nodes.py --stages loader > results.json
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAVER_FORMATS = ["png", "webp", "mp4", "webm", "png_tar", "webp_tar"]
+
+
+def load_nodes():
+    """Import this node pack as a package, the way ComfyUI does, without ComfyUI."""
+    spec = importlib.util.spec_from_file_location("sharpness_nodes", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _rss_bytes():
+    """Current resident set size, or None where it cannot be read without extra packages."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class PeakRSS:
+    """Samples RSS on a background thread for the duration of a `with` block."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _rss_bytes()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = _rss_bytes()
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+
+
+def synthetic_frame(base, i, blur_period):
+    """Frame `i`: the base texture scrolled, blurred on a `blur_period` cycle (0 = sharp), with its number drawn."""
+    img = np.roll(base, i * 4, axis=1)
+    level = i % blur_period if blur_period > 1 else 0
+    if level:
+        k = 2 * level + 1
+        img = cv2.GaussianBlur(img, (k, k), 0)
+    cv2.putText(img, str(i), (16, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+    return img
+
+
+def make_video(path, frames, width, height, fps, gop, blur_period, ffmpeg_path):
+    """Write a synthetic test video; returns how it was encoded."""
+    base = (np.random.default_rng(0).random((height, width, 3)) * 255).astype(np.uint8)
+    base = cv2.GaussianBlur(base, (3, 3), 0)
+
+    if ffmpeg_path:
+        cmd = [ffmpeg_path, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+               "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-g", str(gop), "-keyint_min", str(gop),
+               "-sc_threshold", "0", "-pix_fmt", "yuv420p", path]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        for i in range(frames):
+            proc.stdin.write(synthetic_frame(base, i, blur_period).tobytes())
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to write {path}")
+        return "ffmpeg/libx264"
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        writer.write(synthetic_frame(base, i, blur_period))
+    writer.release()
+    return "cv2/mp4v (GOP not controllable)"
+
+
+def read_batch(video_path, count):
+    """First `count` frames as an RGB float32 IMAGE batch."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return torch.from_numpy(np.stack(frames)).float().div_(255.0)
+
+
+def folder_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def measure(results, stage, variant, frames, fn, repeat, bytes_fn=None):
+    """Run `fn` `repeat` times and append one result record. Returns the last run's return value."""
+    runs = []
+    peak = None
+    value = None
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            value = fn()
+            runs.append(time.perf_counter() - start)
+        if rss.peak is not None:
+            peak = max(peak or 0, rss.peak)
+
+    seconds = float(np.median(runs))
+    record = {
+        "stage": stage,
+        "variant": variant,
+        "frames": frames,
+        "seconds": round(seconds, 4),
+        "runs": [round(r, 4) for r in runs],
+        "fps": round(frames / seconds, 2) if seconds > 0 else None,
+        "latency_ms_per_frame": round(1000 * seconds / frames, 3) if frames else None,
+        "peak_rss_mb": round(peak / 1024 ** 2, 1) if peak is not None else None,
+    }
+    if bytes_fn is not None:
+        record["bytes_written"] = bytes_fn()
+    # Nodes return their own per-stage timings (last run) as the last output
+    outputs = value.get("result") if isinstance(value, dict) else value
+    if isinstance(outputs, tuple) and outputs and isinstance(outputs[-1], str) and outputs[-1].startswith('{"node"'):
+        record["node_stages"] = json.loads(outputs[-1])["stages"]
+    results.append(record)
+    print(f"{stage:<12} {variant:<28} {record['fps'] or 0:>10.1f} fps {seconds:>9.3f} s "
+          f"{record['peak_rss_mb'] or 0:>8.0f} MB")
+    return value
+
+
+def run(args):
+    nodes = load_nodes()
+    saver_mod = sys.modules["sharpness_nodes.fast_saver"]
+    ffmpeg_path = saver_mod._get_ffmpeg(allow_download=False)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sharp_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    stages = set(args.stages.split(","))
+    results = []
+
+    try:
+        video_path = os.path.join(workdir, f"synthetic_{args.width}x{args.height}_{args.frames}_g{args.gop}.mp4")
+        start = time.perf_counter()
+        writer = make_video(video_path, args.frames, args.width, args.height, args.fps, args.gop, args.blur_period,
+                            ffmpeg_path)
+        print(f"Video: {video_path} ({writer}, {time.perf_counter() - start:.1f} s to generate)")
+
+        loader = nodes.NODE_CLASS_MAPPINGS["ParallelSharpnessLoader"]()
+        if "loader" in stages:
+            scanned = -(-args.frames // args.scan_step)
+            for strategy in ("dense", "coarse_to_fine"):
+                images, info, _, _, _ = measure(
+                    results, "loader", f"scan+extract/{strategy}", scanned,
+                    lambda: loader.load_video(video_path, 0, scanned, args.scan_step, args.return_count,
+                                              args.min_distance, 0, use_score_index=False,
+                                              scan_strategy=strategy),
+                    args.repeat)
+            indices = [int(part.split("F:")[1].split(" ")[0]) for part in info.split(", ")]
+            measure(results, "loader", "extract/read_frames", len(indices),
+                    lambda: loader.read_frames(video_path, indices), args.repeat)
+            if args.gop > 1:
+                keyframes = list(range(0, args.frames, args.gop))
+                measure(results, "loader", "extract/read_frames+keyframes", len(indices),
+                        lambda: loader.read_frames(video_path, indices, keyframes), args.repeat)
+
+        batch = None
+        if stages & {"analyzer", "selector", "saver"}:
+            batch = read_batch(video_path, args.batch_frames)
+
+        scores = None
+        if stages & {"analyzer", "selector"}:
+            analyzer = nodes.NODE_CLASS_MAPPINGS["SharpnessAnalyzer"]()
+            engines = ["auto", "legacy"] if "analyzer" in stages else ["auto"]
+            for engine in engines:
+                scores, _ = measure(results, "analyzer", f"laplacian/{engine}", len(batch),
+                                    lambda: analyzer.analyze_sharpness(batch, engine=engine), args.repeat)
+
+        if "selector" in stages:
+            selector = nodes.NODE_CLASS_MAPPINGS["SharpFrameSelector"]()
+            for method in ("batched", "best_n"):
+                measure(results, "selector", method, len(batch),
+                        lambda: selector.select_frames(batch, scores, method, 24, 0, args.return_count, 0.0,
+                                                       args.min_distance),
+                        args.repeat)
+
+        if "saver" in stages:
+            saver = nodes.NODE_CLASS_MAPPINGS["FastAbsoluteSaver"]()
+            variants = []
+            for fmt in args.saver_formats.split(","):
+                if fmt in ("mp4", "webm") and not ffmpeg_path:
+                    print(f"Skipping saver/{fmt}: no ffmpeg found (downloads are disabled here).")
+                    continue
+                encoders = ["pil", "opencv"] if fmt in ("png", "webp", "png_tar", "webp_tar") else ["pil"]
+                variants += [(fmt, encoder) for encoder in encoders]
+
+            for fmt, encoder in variants:
+                out_dir = os.path.join(workdir, f"saver_{fmt}_{encoder}")
+
+                def save():
+                    shutil.rmtree(out_dir, ignore_errors=True)
+                    return saver.save_images_fast(batch, out_dir, "bench_", fmt, False, True, 6, 0, False,
+                                           "sharpness_score", False, True, 90, 4, args.fps, 23, "yuv420p",
+                                           encoder=encoder)
+
+                label = fmt if fmt in ("mp4", "webm") else f"{fmt}/{encoder}"
+                measure(results, "saver", label, len(batch), save, args.repeat,
+                        bytes_fn=lambda: folder_bytes(out_dir))
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "torch": torch.__version__,
+            "ffmpeg": ffmpeg_path,
+        },
+        "video": {
+            "width": args.width, "height": args.height, "frames": args.frames, "fps": args.fps,
+            "gop": args.gop, "blur_period": args.blur_period, "writer": writer,
+        },
+        "settings": {
+            "scan_step": args.scan_step, "return_count": args.return_count, "min_distance": args.min_distance,
+            "batch_frames": len(batch) if batch is not None else 0, "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline_path):
+    """Print each stage's fps against a previous report."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["stage"], r["variant"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for record in report["results"]:
+        old = baseline.get((record["stage"], record["variant"]))
+        if old and old.get("fps") and record.get("fps"):
+            print(f"{record['stage']:<12} {record['variant']:<28} {record['fps'] / old['fps']:>7.2f}x fps")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=480, help="Length of the synthetic video")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--gop", type=int, default=48, help="Keyframe interval (exact with ffmpeg only)")
+    parser.add_argument("--blur-period", type=int, default=6, help="Blur cycle length; frame i gets blur level i %% N")
+    parser.add_argument("--scan-step", type=int, default=2)
+    parser.add_argument("--return-count", type=int, default=10)
+    parser.add_argument("--min-distance", type=int, default=12)
+    parser.add_argument("--batch-frames", type=int, default=96, help="IMAGE batch size for analyzer/selector/saver")
+    parser.add_argument("--stages", default="loader,analyzer,selector,saver")
+    parser.add_argument("--saver-formats", default=",".join(SAVER_FORMATS))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the median is reported")
+    parser.add_argument("--workdir", default="", help="Keep videos and outputs here instead of a temp folder")
+    parser.add_argument("--keep", action="store_true", help="Do not delete the temp folder")
+    parser.add_argument("--out", default="", help="Write the JSON report here (default: stdout, progress on stderr)")
+    parser.add_argument("--compare", default="", help="Previous JSON report to compare fps against")
+    args = parser.parse_args()
+
+    # Everything but the report goes to stderr, including the nodes' prints
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+        print(f"Report written to {args.out}", file=sys.stderr)
+    else:
+        print(payload)
+    if args.compare:
+        with contextlib.redirect_stdout(sys.stderr):
+            compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import os
+import cv2
+import numpy as np
+
+# Default index file inside a dataset folder
+DEDUP_FILE = ".sharp_dedup.npy"
+
+# Below this band width, exact band matches stop narrowing the search; larger radii scan the table
+_MIN_BAND_BITS = 8
+# Hashes added in this run are checked linearly until there are this many, then indexed
+_FRESH_LIMIT = 4096
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        return _BYTE_BITS[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1)
+
+
+def dhash(frame, rgb=False):
+    """64-bit difference hash of a uint8 frame (gray, BGR, or RGB with `rgb=True`).
+
+    The frame is area-resized to 9x8 first, so the colour conversion only touches
+    72 pixels; each bit says whether a pixel is brighter than its left neighbour.
+    """
+    small = cv2.resize(frame, (9, 8), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def index_path(folder_or_file):
+    """`DEDUP_FILE` inside a dataset folder, or the given `.npy` path as is."""
+    path = folder_or_file.strip().strip('"')
+    return path if path.lower().endswith(".npy") else os.path.join(path, DEDUP_FILE)
+
+
+class HashIndex:
+    """Persistent set of 64-bit dHashes with Hamming-radius lookup.
+
+    Stored as one flat uint64 `.npy` (8 bytes per frame) and opened memory-mapped.
+    Lookups use multi-index hashing: the 64 bits are cut into `radius + 1` bands,
+    and by pigeonhole a hash within `radius` bits of a query equals it exactly on
+    at least one band. Each band is a sorted array of narrow keys plus a uint32
+    permutation (about 6 bytes per frame per band), so a query is `radius + 1`
+    binary searches and a popcount over the few candidates. Radii that would make
+    bands narrower than 8 bits scan the table in chunks instead.
+    """
+
+    def __init__(self, path, radius):
+        self.path = path
+        self.radius = radius
+        self._table = self._load()
+        self._fresh = []
+        self._bands = None
+
+    def __len__(self):
+        return len(self._table) + len(self._fresh)
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return np.empty(0, dtype=np.uint64)
+        try:
+            table = np.load(self.path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"xx- Dedup Index | Ignoring unreadable index {self.path}: {e}")
+            return np.empty(0, dtype=np.uint64)
+        if table.dtype != np.uint64 or table.ndim != 1:
+            return np.empty(0, dtype=np.uint64)
+        return table
+
+    def _build(self):
+        bands = self.radius + 1
+        self._bands = []
+        if 64 // bands < _MIN_BAND_BITS:
+            return
+        width, extra = divmod(64, bands)
+        shift = 0
+        order_dtype = np.uint32 if len(self._table) < 2 ** 32 else np.int64
+        for b in range(bands):
+            bits = width + (1 if b < extra else 0)
+            key_dtype = np.uint8 if bits <= 8 else np.uint16 if bits <= 16 else np.uint32 if bits <= 32 else np.uint64
+            mask = np.uint64((1 << bits) - 1)
+            keys = ((self._table >> np.uint64(shift)) & mask).astype(key_dtype)
+            order = np.argsort(keys, kind="stable").astype(order_dtype)
+            self._bands.append((np.uint64(shift), mask, keys[order], order))
+            shift += bits
+
+    def _near_table(self, h):
+        if len(self._table) == 0:
+            return False
+        if self._bands is None:
+            self._build()
+        h = np.uint64(h)
+        if not self._bands:
+            for start in range(0, len(self._table), 1 << 20):
+                if (_popcount(self._table[start:start + (1 << 20)] ^ h) <= self.radius).any():
+                    return True
+            return False
+        for shift, mask, keys, order in self._bands:
+            # Same dtype as the keys, or searchsorted would upcast the whole band
+            key = keys.dtype.type((h >> shift) & mask)
+            lo = np.searchsorted(keys, key, side="left")
+            hi = np.searchsorted(keys, key, side="right")
+            if hi > lo and (_popcount(self._table[order[lo:hi]] ^ h) <= self.radius).any():
+                return True
+        return False
+
+    def contains(self, h):
+        """True if a stored hash is within `radius` bits of `h`."""
+        if any(hamming(h, other) <= self.radius for other in self._fresh):
+            return True
+        return self._near_table(h)
+
+    def add(self, hashes):
+        self._fresh.extend(int(h) for h in hashes)
+        if len(self._fresh) >= _FRESH_LIMIT:
+            self._table = np.concatenate([np.asarray(self._table), np.array(self._fresh, dtype=np.uint64)])
+            self._fresh = []
+            self._bands = None
+
+    def filter(self, hashes):
+        """Positions of `hashes` that are neither in the index nor near an earlier one; those are added."""
+        keep = []
+        for i, h in enumerate(hashes):
+            if not self.contains(h):
+                self.add([h])
+                keep.append(i)
+        return keep
+
+    def save(self):
+        # Held in memory from here on: a mapped file cannot be replaced on Windows
+        table = np.concatenate([np.asarray(self._table), np.array(self._fresh, dtype=np.uint64)])
+        self._table, self._fresh, self._bands = table, [], None
+        tmp_path = self.path + ".tmp.npy"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            np.save(tmp_path, table)
+            os.replace(tmp_path, self.path)
+            return True
+        except OSError as e:
+            print(f"xx- Dedup Index | Could not write {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
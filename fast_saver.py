@@ -3,9 +3,20 @@ import sys
 import platform
 import torch
 import numpy as np
-from PIL import Image, ExifTags
+import cv2
+from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 import concurrent.futures
+import collections
+import functools
+import hashlib
+import io
+import struct
+import zlib
+import contextlib
+import threading
+import queue
+import atexit
 import re
 import time
 import glob
@@ -17,17 +28,19 @@ import tempfile
 import urllib.request
 import zipfile
 import tarfile
+from .instrumentation import instrumented
+from .dedup_index import DEDUP_FILE, HashIndex, dhash
 
 _NODE_DIR = os.path.dirname(os.path.abspath(__file__))
 _FFMPEG_DIR = os.path.join(_NODE_DIR, "ffmpeg_bin")
 
 
-def _get_ffmpeg():
+def _get_ffmpeg(allow_download=True):
     """Find or download a ffmpeg binary. Search order:
     1. Bundled binary in this node's ffmpeg_bin/ folder
     2. imageio_ffmpeg (shipped by VideoHelperSuite)
     3. System PATH
-    4. Auto-download a static build into ffmpeg_bin/
+    4. Auto-download a static build into ffmpeg_bin/ (returns None instead if allow_download is False)
     """
     system = platform.system()
     exe_name = "ffmpeg.exe" if system == "Windows" else "ffmpeg"
@@ -51,6 +64,9 @@ def _get_ffmpeg():
     if system_bin:
         return system_bin
 
+    if not allow_download:
+        return None
+
     # 4. Auto-download static build
     print("xx- FastSaver: ffmpeg not found. Downloading static build...")
     os.makedirs(_FFMPEG_DIR, exist_ok=True)
@@ -103,6 +119,205 @@ def _get_ffmpeg():
     print(f"xx- FastSaver: ffmpeg downloaded to {local_bin}")
     return local_bin
 
+# A segment shorter than this costs more in process start-up than it saves
+_MIN_SEGMENT_FRAMES = 48
+
+
+def _uint8_chunks(images, chunk_size=32):
+    """Yield (start, uint8 numpy array) for an IMAGE batch, `chunk_size` frames at a time.
+
+    Each chunk is scaled, clamped and truncated in a few whole-chunk torch ops on
+    the images' own device, so GPU batches cross to the host as uint8. Values
+    match the per-frame `np.clip(255. * x, 0, 255).astype(np.uint8)`. Each chunk
+    is a fresh array: rows handed to workers stay valid after the next chunk.
+    """
+    for start in range(0, len(images), chunk_size):
+        chunk = images[start:start + chunk_size]
+        if chunk.dtype != torch.uint8:
+            with torch.no_grad():
+                chunk = chunk.to(torch.float32).mul(255.0).clamp_(0, 255).to(torch.uint8)
+        elif chunk.device.type == "cpu":
+            chunk = chunk.clone()
+        yield start, chunk.cpu().numpy()
+
+
+def _pipe_to_ffmpeg(cmd, images, max_chunks=2, timings=None):
+    """Run ffmpeg `cmd`, feeding `images` as rgb24 frames on stdin. Returns (returncode, stderr bytes).
+
+    A producer thread converts the next `_uint8_chunks` chunk while this thread
+    writes the previous one to the pipe; at most `max_chunks` wait in between.
+    stderr is drained on its own thread, so a chatty encoder never stalls on a
+    full pipe.
+    """
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = []
+    drain = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    drain.start()
+
+    chunks = queue.Queue(maxsize=max_chunks)
+
+    def produce():
+        # Ends with None, or with the exception that stopped the conversion
+        try:
+            source = _uint8_chunks(images)
+            if timings is not None:
+                source = timings.timed_iter("convert", source, count=lambda item: len(item[1]))
+            for _, chunk in source:
+                chunks.put(np.ascontiguousarray(chunk))
+                if timings is not None:
+                    timings.gauge("pipe_queue_chunks", chunks.qsize())
+            chunks.put(None)
+        except Exception as e:
+            chunks.put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    broken = False
+    while True:
+        item = chunks.get()
+        if not isinstance(item, np.ndarray):
+            break
+        if not broken:
+            try:
+                start = time.perf_counter()
+                proc.stdin.write(memoryview(item))
+                if timings is not None:
+                    timings.add("pipe_write", time.perf_counter() - start, len(item), item.nbytes)
+            except (BrokenPipeError, OSError):
+                # ffmpeg exited early; keep consuming so the producer can finish
+                broken = True
+    try:
+        proc.stdin.close()
+    except OSError:
+        pass
+    producer.join()
+    proc.wait()
+    drain.join()
+    if isinstance(item, Exception):
+        raise item
+    return proc.returncode, stderr[0] if stderr else b""
+
+
+def _text_chunk(key, value):
+    """(chunk type, payload, raw chunk bytes) of a PNG text chunk, as PIL's add_text builds it.
+
+    Latin-1 text becomes tEXt, anything else an uncompressed UTF-8 iTXt.
+    """
+    key = key.encode("latin-1", "strict")
+    try:
+        cid, payload = b"tEXt", key + b"\0" + value.encode("latin-1", "strict")
+    except UnicodeError:
+        cid, payload = b"iTXt", key + b"\0\0\0\0\0" + value.encode("utf-8")
+    raw = struct.pack(">I", len(payload)) + cid + payload + struct.pack(">I", zlib.crc32(cid + payload) & 0xFFFFFFFF)
+    return cid, payload, raw
+
+
+class _AsyncWriter:
+    """Process-wide background writer: daemon threads draining one bounded job queue.
+
+    `submit` blocks while `max_pending` jobs are queued, so a producer can never
+    run further ahead of the disk than that; `resize` changes the bound. Results
+    are counted and handed out by `report`; `flush` (also run at interpreter exit)
+    waits for the queue.
+    """
+
+    def __init__(self, max_pending):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._written = 0
+        self._failed = []
+        atexit.register(self.flush)
+
+    def ensure_workers(self, count):
+        while len(self._threads) < count:
+            thread = threading.Thread(target=self._run, name=f"FastSaver-writer-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def resize(self, max_pending):
+        # Producers blocked on a full queue re-check the bound when woken
+        with self._queue.not_full:
+            self._queue.maxsize = max_pending
+            self._queue.not_full.notify_all()
+
+    def submit(self, label, fn, *args, batch=None):
+        self._queue.put((label, fn, args, batch))
+
+    def _run(self):
+        while True:
+            label, fn, args, batch = self._queue.get()
+            try:
+                ok = fn(*args)
+            except Exception as e:
+                print(f"xx- FastSaver: Background write of {label} failed: {e}")
+                ok = False
+            with self._lock:
+                if ok is False:
+                    self._failed.append(label)
+                else:
+                    self._written += 1
+            try:
+                if batch is not None:
+                    batch.job_done()
+            except Exception as e:
+                print(f"xx- FastSaver: Background batch callback failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def report(self):
+        """(written, failed labels) since the last report."""
+        with self._lock:
+            written, failed = self._written, self._failed
+            self._written, self._failed = 0, []
+        return written, failed
+
+    def flush(self):
+        if self._queue.unfinished_tasks:
+            print(f"xx- FastSaver: Waiting for {self._queue.unfinished_tasks} background writes...")
+        self._queue.join()
+
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+# Next free filename counter per (output folder, prefix):
+# {"next": int, "mtime": folder mtime_ns it was valid for, "pending": background batches}
+_COUNTERS = {}
+_COUNTERS_LOCK = threading.Lock()
+
+
+class _Batch:
+    """Runs `callback` once the background writer has finished `remaining` jobs."""
+
+    def __init__(self, remaining, callback):
+        self.remaining = remaining
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def job_done(self):
+        with self._lock:
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished:
+            self.callback()
+
+
+def _get_writer(workers, max_pending):
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = _AsyncWriter(max_pending)
+        else:
+            _WRITER.resize(max_pending)
+        _WRITER.ensure_workers(workers)
+        return _WRITER
+
+
 class FastAbsoluteSaver:
     @classmethod
     def INPUT_TYPES(s):
@@ -113,7 +328,7 @@ class FastAbsoluteSaver:
                 "filename_prefix": ("STRING", {"default": "frame"}),
                 
                 # --- FORMAT SWITCH ---
-                "save_format": (["png", "webp", "mp4", "webm"], ),
+                "save_format": (["png", "webp", "mp4", "webm", "png_tar", "webp_tar"], ),
                 
                 # --- NAMING CONTROL ---
                 "use_timestamp": ("BOOLEAN", {"default": False, "label": "Add Timestamp (Unique)"}),
@@ -140,12 +355,34 @@ class FastAbsoluteSaver:
             },
             "optional": {
                 "scores_info": ("STRING", {"forceInput": True}),
+
+                # --- BACKGROUND SAVING (images only) ---
+                "async_save": ("BOOLEAN", {"default": False, "label": "Save in Background (Return Immediately)"}),
+                "async_queue_frames": ("INT", {"default": 64, "min": 1, "max": 100000, "step": 1, "label": "Background Queue Limit (Frames)"}),
+
+                # --- TAR SHARDS (png_tar / webp_tar) ---
+                "shard_size_mb": ("INT", {"default": 1024, "min": 1, "max": 1048576, "step": 1, "label": "Shard Size (MB)"}),
+
+                # --- ENCODER (png / webp) ---
+                "encoder": (["pil", "opencv"], {"default": "pil"}),
+                "png_compression": ("INT", {"default": 1, "min": 0, "max": 9, "step": 1, "label": "PNG Compression (0=Fastest)"}),
+
+                # --- VIDEO ENCODING (mp4 / webm) ---
+                "video_segments": ("INT", {"default": 1, "min": 1, "max": 64, "step": 1, "label": "Parallel Video Segments"}),
+
+                # --- NEAR-DUPLICATES (images and tar shards) ---
+                "skip_duplicates": ("BOOLEAN", {"default": False, "label": "Skip Near-Duplicates (Dataset Index)"}),
+                "dedup_threshold": ("INT", {"default": 6, "min": 0, "max": 16, "step": 1, "label": "Duplicate If Within (Bits of 64)"}),
+
+                # --- INSTRUMENTATION ---
+                "profile_dir": ("STRING", {"default": "", "label": "cProfile Dump Folder (Empty = Off)"}),
             },
             # Hidden inputs used to capture the workflow graph
             "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},
         }
 
-    RETURN_TYPES = ()
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("timings",)
     FUNCTION = "save_images_fast"
     OUTPUT_NODE = True
     CATEGORY = "BetaHelper/IO"
@@ -169,7 +406,20 @@ class FastAbsoluteSaver:
             scores.extend([0.0] * missing)
         return frames[:batch_size], scores[:batch_size]
 
-    def get_start_index(self, output_path, prefix):
+    def parse_sources(self, info_str, batch_size):
+        # "Src:" names the source clip (Folder Loader); None where it is absent
+        if not info_str:
+            return [None] * batch_size
+        matches = re.findall(r"F:\d+\s*\(Score:\s*\d+(?:\.\d+)?(?:,\s*Src:([^)]*))?\)", info_str)
+        sources = [re.sub(r"[^\w.-]+", "_", os.path.splitext(m.strip())[0]) if m.strip() else None for m in matches]
+        sources.extend([None] * (batch_size - len(sources)))
+        return sources[:batch_size]
+
+    def counter_state_path(self, output_path, prefix):
+        safe_prefix = re.sub(r"[^\w.-]+", "_", prefix)
+        return os.path.join(output_path, f".sharp_counter_{safe_prefix}.json")
+
+    def scan_start_index(self, output_path, prefix):
         # Scans the directory ONCE to find the highest existing number.
         print(f"xx- FastSaver: Scanning folder for existing '{prefix}' files...")
         files = glob.glob(os.path.join(output_path, f"{prefix}*.*"))
@@ -188,73 +438,134 @@ class FastAbsoluteSaver:
                         max_idx = val
                 except ValueError:
                     continue
+
+        # Tar shards: keys only grow, so the newest shard holds the highest number
+        shards = self.shard_paths(output_path, prefix)
+        if shards:
+            try:
+                with tarfile.open(shards[-1], "r") as tar:
+                    for name in tar.getnames():
+                        match = pattern.match(name)
+                        if match:
+                            max_idx = max(max_idx, int(match.group(1)))
+            except (OSError, tarfile.TarError) as e:
+                print(f"xx- FastSaver: Could not read shard {shards[-1]}: {e}")
         print(f"xx- FastSaver: Found highest index {max_idx}. Starting at {max_idx + 1}")
         return max_idx + 1
 
-    def save_single_image(self, tensor_img, full_path, score, key_name, fmt, lossless, quality, method, 
-                          save_workflow, prompt_data, extra_data):
+    def get_start_index(self, output_path, prefix, count=0):
+        """Next free counter for `prefix` in `output_path`, reserving `count` numbers.
+
+        The counter is cached in memory and in a small `.sharp_counter_{prefix}.json`
+        next to the files, together with the folder's mtime at the time it was
+        written. The folder is only globbed when that mtime no longer matches, i.e.
+        something else touched the folder since our last save. While this process
+        still has background batches pending for the folder, the counter is trusted
+        as is: those writes change the mtime themselves.
+        """
+        key = (os.path.normcase(os.path.abspath(output_path)), prefix)
+        mtime = os.stat(output_path).st_mtime_ns
+
+        with _COUNTERS_LOCK:
+            state = _COUNTERS.get(key)
+            if state is None:
+                try:
+                    with open(self.counter_state_path(output_path, prefix), "r", encoding="utf-8") as f:
+                        saved = json.load(f)
+                    state = {"next": int(saved["next"]), "mtime": int(saved["mtime_ns"]), "pending": 0}
+                except (OSError, ValueError, KeyError, TypeError):
+                    state = None
+
+            # Our own background writes keep changing the folder mtime until they finish
+            if state is not None and (state["pending"] or state["mtime"] == mtime):
+                start = state["next"]
+            else:
+                start = self.scan_start_index(output_path, prefix)
+                state = {"next": start, "mtime": mtime, "pending": 0}
+
+            state["next"] = start + count
+            _COUNTERS[key] = state
+        return start
+
+    def counter_batch(self, output_path, prefix, count):
+        """_Batch that refreshes the cached counter once `count` background writes are done."""
+        key = (os.path.normcase(os.path.abspath(output_path)), prefix)
+        with _COUNTERS_LOCK:
+            _COUNTERS[key]["pending"] += 1
+
+        def finished():
+            with _COUNTERS_LOCK:
+                _COUNTERS[key]["pending"] -= 1
+            self.store_counter(output_path, prefix)
+
+        return _Batch(count, finished)
+
+    def store_counter(self, output_path, prefix):
+        """Mark the cached counter as valid for the folder as it is now (after our writes)."""
+        key = (os.path.normcase(os.path.abspath(output_path)), prefix)
+        state_path = self.counter_state_path(output_path, prefix)
         try:
-            array = 255. * tensor_img.cpu().numpy()
-            img = Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
-            
-            # --- METADATA PREPARATION ---
-            meta_png = PngInfo()
-            exif_bytes = None
-
-            # 1. Custom Score Metadata (only if score was actually provided)
-            if fmt == "png":
-                if score is not None:
-                    meta_png.add_text(key_name, str(score))
-                meta_png.add_text("software", "ComfyUI_Parallel_Node")
-            
-            # 2. ComfyUI Workflow Metadata (If requested)
-            if save_workflow:
-                # Prepare JSON payloads
-                workflow_json = json.dumps(extra_data.get("workflow", {})) if extra_data else "{}"
-                prompt_json = json.dumps(prompt_data) if prompt_data else "{}"
+            # The state file is rewritten in place: only creating it changes the folder mtime
+            if not os.path.exists(state_path):
+                open(state_path, "w").close()
+            with _COUNTERS_LOCK:
+                state = _COUNTERS.get(key)
+                if state is None:
+                    return
+                state["mtime"] = os.stat(output_path).st_mtime_ns
+                with open(state_path, "r+", encoding="utf-8") as f:
+                    f.truncate()
+                    json.dump({"prefix": prefix, "next": state["next"], "mtime_ns": state["mtime"]}, f)
+        except OSError as e:
+            print(f"xx- FastSaver: Could not write counter state {state_path}: {e}")
+
+    def png_metadata(self, save_workflow, prompt_data, extra_data):
+        """Text chunks shared by every PNG of a batch, serialised once per batch."""
+        chunks = [_text_chunk("software", "ComfyUI_Parallel_Node")]
+        if save_workflow:
+            prompt_json = json.dumps(prompt_data) if prompt_data else "{}"
+            workflow_json = json.dumps(extra_data.get("workflow", {})) if extra_data else "{}"
+            chunks.append(_text_chunk("prompt", prompt_json))
+            chunks.append(_text_chunk("workflow", workflow_json))
+        return chunks
+
+    def save_single_image(self, frame, full_path, score, key_name, fmt, lossless, quality, method,
+                          png_meta=(), encoder="pil", compress_level=1):
+        # `frame` is one (H, W, C) uint8 row of a `_uint8_chunks` chunk; `png_meta`
+        # comes from `png_metadata`, so only the score chunk is built per frame.
+        # WebP files carry no workflow: writing Exif would need an extra dependency.
+        try:
+            chunks = list(png_meta)
+            if fmt == "png" and score is not None:
+                chunks.insert(0, _text_chunk(key_name, str(score)))
 
+            if encoder == "opencv" and frame.ndim == 3 and frame.shape[2] == 3:
+                bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
                 if fmt == "png":
-                    # Standard PNG text chunks
-                    meta_png.add_text("prompt", prompt_json)
-                    meta_png.add_text("workflow", workflow_json)
-                
-                elif fmt == "webp":
-                    # WebP: Embed in Exif UserComment (Standard ComfyUI method)
-                    # We construct a JSON dict containing the workflow
-                    exif_payload = {
-                        "prompt": prompt_data,
-                        "workflow": extra_data.get("workflow", {}) if extra_data else {}
-                    }
-                    # We also add the custom score here for WebP readers that check Exif
-                    if score is not None:
-                        exif_payload[key_name] = score
-                    
-                    user_comment = json.dumps(exif_payload)
-                    
-                    # Create Exif data with tag 0x9286 (UserComment)
-                    exif_dict = {
-                        ExifTags.IFD.Exif: {
-                            0x9286: user_comment.encode('utf-8')
-                        }
-                    }
-                    
-                    # Pillow requires raw bytes for 'exif='
-                    # Since we want to avoid 'piexif' dependency, we do a lightweight workaround:
-                    # We just save the image. Pillow WebP writer doesn't support easy Exif writing 
-                    # without external libs or pre-existing exif.
-                    # 
-                    # FALLBACK: If we can't write complex Exif easily without piexif, 
-                    # we will skip WebP workflow embedding to keep this node dependency-free.
-                    # 
-                    # BUT, ComfyUI users expect it. 
-                    # Strategy: If format is WebP and workflow is ON, we assume 
-                    # the user is okay with a slightly slower save or we skip it if dependencies missing.
-                    # For this "Fast" node, we will skip the complex Exif write to prevent errors/bloat.
-                    pass
-
-            # --- SAVING ---
+                    ok, buf = cv2.imencode(".png", bgr, [cv2.IMWRITE_PNG_COMPRESSION, compress_level])
+                    data = bytes(buf) if ok else None
+                    if data:
+                        # tEXt chunks go right after the 8-byte signature and the 25-byte IHDR chunk
+                        data = data[:33] + b"".join(raw for _, _, raw in chunks) + data[33:]
+                else:
+                    # OpenCV treats a quality above 100 as lossless; `method` has no equivalent
+                    ok, buf = cv2.imencode(".webp", bgr, [cv2.IMWRITE_WEBP_QUALITY, 101 if lossless else max(1, quality)])
+                    data = bytes(buf) if ok else None
+                if not data:
+                    raise RuntimeError("cv2.imencode failed")
+                if isinstance(full_path, str):
+                    with open(full_path, "wb") as f:
+                        f.write(data)
+                else:
+                    full_path.write(data)
+                return True
+
+            img = Image.fromarray(frame)
             if fmt == "png":
-                img.save(full_path, format="PNG", pnginfo=meta_png, compress_level=1)
+                meta_png = PngInfo()
+                for cid, payload, _ in chunks:
+                    meta_png.add(cid, payload)
+                img.save(full_path, format="PNG", pnginfo=meta_png, compress_level=compress_level)
             
             elif fmt == "webp":
                 img.save(full_path, format="WEBP", lossless=lossless, quality=quality, method=method) 
@@ -264,8 +575,125 @@ class FastAbsoluteSaver:
             print(f"xx- Error saving {full_path}: {e}")
             return False
 
+    def encode_image(self, frame, score, key_name, fmt, lossless, quality, method, png_meta=(), encoder="pil",
+                     compress_level=1):
+        """PNG/WebP bytes of one frame, for tar shards."""
+        buf = io.BytesIO()
+        if not self.save_single_image(frame, buf, score, key_name, fmt, lossless, quality, method,
+                                      png_meta, encoder, compress_level):
+            raise RuntimeError("Image encoding failed.")
+        return buf.getvalue()
+
+    def unique_positions(self, images, output_path, threshold):
+        """Positions of frames that are not near-duplicates of the folder's dedup index or of an earlier frame.
+
+        Their dHashes are added to `DEDUP_FILE` in `output_path`.
+        """
+        index = HashIndex(os.path.join(output_path, DEDUP_FILE), threshold)
+        hashes = [dhash(frame, rgb=True) for _, chunk in _uint8_chunks(images) for frame in chunk]
+        keep = index.filter(hashes)
+        index.save()
+        return keep
+
+    def save_workflow_file(self, output_path, prefix, prompt_data, extra_data):
+        """Write the prompt/workflow once as `{prefix}-workflow-{hash}.json`; returns its file name."""
+        payload = json.dumps({
+            "prompt": prompt_data or {},
+            "workflow": extra_data.get("workflow", {}) if extra_data else {},
+        })
+        name = f"{prefix}-workflow-{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}.json"
+        path = os.path.join(output_path, name)
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(payload)
+        return name
+
+    def shard_paths(self, output_path, prefix):
+        return sorted(glob.glob(os.path.join(glob.escape(output_path), f"{glob.escape(prefix)}-{'[0-9]' * 6}.tar")))
+
+    def save_tar_shards(self, images, output_path, prefix, names, frame_indices, scores_list, sources, key_name, fmt,
+                        lossless, quality, method, shard_bytes, workflow_ref, max_threads, png_meta=(), encoder="pil",
+                        compress_level=1):
+        """Stream encoded frames into rolling `{prefix}-NNNNNN.tar` shards (WebDataset layout).
+
+        Every frame becomes `{name}.{fmt}` plus `{name}.json` (score, source frame,
+        source clip, workflow file). Frames are encoded in parallel and appended in
+        order; the last shard of an earlier run is continued until it reaches
+        `shard_bytes`, so Auto Queue runs keep filling the same shard.
+        """
+        shards = self.shard_paths(output_path, prefix)
+        shard_no = int(shards[-1][-10:-4]) if shards else 0
+        path = os.path.join(output_path, f"{prefix}-{shard_no:06d}.tar")
+        if os.path.exists(path) and os.path.getsize(path) >= shard_bytes:
+            shard_no += 1
+            path = os.path.join(output_path, f"{prefix}-{shard_no:06d}.tar")
+        tar = tarfile.open(path, "a" if os.path.exists(path) else "w")
+        print(f"xx- FastSaver: Writing {len(images)} frames to shard {path}...")
+
+        def add(name, data):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+                for start, chunk in _uint8_chunks(images, max(max_threads, 8) * 2):
+                    scores = [scores_list[start + j] if scores_list else None for j in range(len(chunk))]
+                    encode = functools.partial(self.encode_image, key_name=key_name, fmt=fmt, lossless=lossless,
+                                               quality=quality, method=method, png_meta=png_meta, encoder=encoder,
+                                               compress_level=compress_level)
+                    encoded = executor.map(encode, chunk, scores)
+                    for j, data in enumerate(encoded):
+                        i = start + j
+                        if tar.offset >= shard_bytes:
+                            tar.close()
+                            shard_no += 1
+                            path = os.path.join(output_path, f"{prefix}-{shard_no:06d}.tar")
+                            tar = tarfile.open(path, "w")
+                            print(f"xx- FastSaver: Started shard {path}")
+                        sidecar = {key_name: scores[j], "frame_index": frame_indices[i],
+                                   "source": sources[i], "workflow": workflow_ref}
+                        add(f"{names[i]}.{fmt}", data)
+                        add(f"{names[i]}.json", json.dumps(sidecar).encode("utf-8"))
+        finally:
+            tar.close()
+
+    def encode_segments(self, ffmpeg_path, images, segments, raw_input, codec_args, mux_args, meta_file, out_file, ext,
+                        timings=None):
+        """Encode `segments` consecutive slices of `images` concurrently, then join them without re-encoding.
+
+        Each slice is its own ffmpeg process (with its share of the cores) writing a
+        part file next to the output; the concat demuxer then copies the parts'
+        packets into `out_file` and attaches the metadata. Returns (returncode, stderr).
+        """
+        bounds = np.linspace(0, len(images), segments + 1).astype(int).tolist()
+        threads = str(max(1, (os.cpu_count() or 4) // segments))
+        part_dir = tempfile.mkdtemp(prefix=".sharp_segments_", dir=os.path.dirname(out_file))
+        try:
+            parts = [os.path.join(part_dir, f"part_{k:03d}{ext}") for k in range(segments)]
+            cmds = [[ffmpeg_path, "-y", *raw_input, *codec_args, "-threads", threads, part] for part in parts]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=segments) as executor:
+                results = list(executor.map(_pipe_to_ffmpeg, cmds,
+                                            [images[bounds[k]:bounds[k + 1]] for k in range(segments)],
+                                            [2] * segments, [timings] * segments))
+            for returncode, stderr in results:
+                if returncode != 0:
+                    return returncode, stderr
+
+            list_file = os.path.join(part_dir, "parts.txt")
+            with open(list_file, "w", encoding="utf-8") as f:
+                f.write("".join(f"file '{os.path.basename(part)}'\n" for part in parts))
+            cmd = [ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", list_file,
+                   "-i", meta_file, "-map", "0", "-map_metadata", "1", "-c", "copy", *mux_args, out_file]
+            proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            return proc.returncode, proc.stderr
+        finally:
+            shutil.rmtree(part_dir, ignore_errors=True)
+
     def save_video(self, images, output_path, filename_prefix, use_timestamp, fps, crf, pixel_format, video_format,
-                   scores_list=None, metadata_key="sharpness_score", save_workflow=False, prompt_data=None, extra_data=None):
+                   scores_list=None, metadata_key="sharpness_score", save_workflow=False, prompt_data=None, extra_data=None,
+                   video_segments=1, timings=None):
         """Save image batch as a video file using ffmpeg."""
         ffmpeg_path = _get_ffmpeg()
 
@@ -303,60 +731,47 @@ class FastAbsoluteSaver:
 
         if video_format == "mp4":
             codec = "libx264"
-            cmd = [
-                ffmpeg_path, "-y",
-                "-f", "rawvideo", "-pix_fmt", "rgb24",
-                "-s", f"{w}x{h}", "-r", str(fps),
-                "-i", "-",
-                "-i", meta_file, "-map_metadata", "1",
-                "-c:v", codec, "-crf", str(crf),
-                "-pix_fmt", pixel_format,
-                "-movflags", "+faststart",
-                out_file
-            ]
+            codec_args = ["-c:v", codec, "-crf", str(crf), "-pix_fmt", pixel_format]
+            mux_args = ["-movflags", "+faststart"]
         else:  # webm
             codec = "libvpx-vp9"
-            cmd = [
-                ffmpeg_path, "-y",
-                "-f", "rawvideo", "-pix_fmt", "rgb24",
-                "-s", f"{w}x{h}", "-r", str(fps),
-                "-i", "-",
-                "-i", meta_file, "-map_metadata", "1",
-                "-c:v", codec, "-crf", str(crf), "-b:v", "0",
-                "-pix_fmt", pixel_format,
-                out_file
-            ]
-
-        print(f"xx- FastSaver: Encoding {batch_size} frames to {out_file} ({codec}, crf={crf}, {fps}fps)...")
-
-        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
-        try:
-            for img_tensor in images:
-                frame = (255.0 * img_tensor.cpu().numpy()).clip(0, 255).astype(np.uint8)
-                proc.stdin.write(frame.tobytes())
-            proc.stdin.close()
-        except BrokenPipeError:
-            pass
-        stderr = proc.stderr.read()
-        proc.wait()
-
-        # Clean up metadata temp file
+            codec_args = ["-c:v", codec, "-crf", str(crf), "-b:v", "0", "-pix_fmt", pixel_format]
+            mux_args = []
+        raw_input = ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(fps), "-i", "-"]
+
+        segments = max(1, min(video_segments, batch_size // _MIN_SEGMENT_FRAMES))
+        print(f"xx- FastSaver: Encoding {batch_size} frames to {out_file} ({codec}, crf={crf}, {fps}fps"
+              f"{f', {segments} segments' if segments > 1 else ''})...")
+
         try:
-            os.remove(meta_file)
-        except OSError:
-            pass
+            if segments == 1:
+                cmd = [ffmpeg_path, "-y", *raw_input, "-i", meta_file, "-map_metadata", "1",
+                       *codec_args, *mux_args, out_file]
+                returncode, stderr = _pipe_to_ffmpeg(cmd, images, timings=timings)
+            else:
+                returncode, stderr = self.encode_segments(ffmpeg_path, images, segments, raw_input, codec_args,
+                                                          mux_args, meta_file, out_file, ext, timings)
+        finally:
+            # Clean up metadata temp file
+            try:
+                os.remove(meta_file)
+            except OSError:
+                pass
 
-        if proc.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed: {stderr.decode()}")
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace')}")
 
         print(f"xx- FastSaver: Video saved to {out_file}")
         return out_file
 
+    @instrumented("FastAbsoluteSaver")
     def save_images_fast(self, images, output_path, filename_prefix, save_format, use_timestamp, auto_increment, counter_digits,
                          max_threads, filename_with_score, metadata_key, save_workflow_metadata,
                          webp_lossless, webp_quality, webp_method,
                          video_fps, video_crf, video_pixel_format,
-                         scores_info=None, prompt=None, extra_pnginfo=None):
+                         scores_info=None, async_save=False, async_queue_frames=64, shard_size_mb=1024,
+                         encoder="pil", png_compression=1, video_segments=1, skip_duplicates=False, dedup_threshold=6,
+                         prompt=None, extra_pnginfo=None, timings=None):
         
         output_path = output_path.strip('"')
         if not os.path.exists(output_path):
@@ -372,60 +787,153 @@ class FastAbsoluteSaver:
         if save_format in ("mp4", "webm"):
             batch_size = len(images)
             _, scores_list = self.parse_info(scores_info, batch_size)
-            self.save_video(images, output_path, filename_prefix, use_timestamp,
-                            video_fps, video_crf, video_pixel_format, save_format,
-                            scores_list=scores_list, metadata_key=metadata_key,
-                            save_workflow=save_workflow_metadata, prompt_data=prompt,
-                            extra_data=extra_pnginfo)
+            out_file = self.save_video(images, output_path, filename_prefix, use_timestamp,
+                                       video_fps, video_crf, video_pixel_format, save_format,
+                                       scores_list=scores_list, metadata_key=metadata_key,
+                                       save_workflow=save_workflow_metadata, prompt_data=prompt,
+                                       extra_data=extra_pnginfo, video_segments=video_segments, timings=timings)
+            timings.lap("video", frames=batch_size, nbytes=os.path.getsize(out_file))
             return {"ui": {"images": []}}
 
         if max_threads == 0:
             max_threads = os.cpu_count() or 4
 
+        # Results of earlier background saves
+        if _WRITER is not None:
+            written, failed = _WRITER.report()
+            if written or failed:
+                print(f"xx- FastSaver: Background writer saved {written} files since the last run, {len(failed)} failed.")
+                for path in failed[:10]:
+                    print(f"xx- FastSaver:   failed: {path}")
+
         batch_size = len(images)
         frame_indices, scores_list = self.parse_info(scores_info, batch_size)
+        sources = self.parse_sources(scores_info, batch_size)
+
+        # --- NEAR-DUPLICATES ---
+        if skip_duplicates:
+            keep = self.unique_positions(images, output_path, dedup_threshold)
+            timings.lap("dedup", frames=batch_size)
+            if len(keep) < batch_size:
+                print(f"xx- FastSaver: Skipping {batch_size - len(keep)} near-duplicates of the dataset.")
+                if not keep:
+                    return {"ui": {"images": []}}
+                images = images[keep]
+                frame_indices = [frame_indices[i] for i in keep]
+                scores_list = [scores_list[i] for i in keep] if scores_list else scores_list
+                sources = [sources[i] for i in keep]
+                batch_size = len(keep)
 
         # --- INDEX LOGIC ---
         start_counter = 0
         using_real_frames = any(idx > 0 for idx in frame_indices)
+        counting = auto_increment and not use_timestamp and not using_real_frames
 
-        if auto_increment and not use_timestamp and not using_real_frames:
-            start_counter = self.get_start_index(output_path, filename_prefix)
+        if counting:
+            start_counter = self.get_start_index(output_path, filename_prefix, batch_size)
 
         ts_str = f"_{int(time.time())}" if use_timestamp else ""
 
-        print(f"xx- FastSaver: Saving {batch_size} images to {output_path}...")
+        # --- NAMES ---
+        names = []
+        for i in range(batch_size):
+            real_frame_num = frame_indices[i]
+            current_score = scores_list[i] if scores_list else None
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-            futures = []
-            
-            for i, img_tensor in enumerate(images):
-                real_frame_num = frame_indices[i]
-                current_score = scores_list[i] if scores_list else None
-
-                if real_frame_num > 0:
-                    number_part = real_frame_num
-                else:
-                    number_part = start_counter + i
+            if real_frame_num > 0:
+                number_part = real_frame_num
+            else:
+                number_part = start_counter + i
 
-                fmt_str = f"{{:0{counter_digits}d}}"
-                number_str = fmt_str.format(number_part)
+            fmt_str = f"{{:0{counter_digits}d}}"
+            number_str = fmt_str.format(number_part)
 
+            # Frames from several clips share frame numbers: keep the clip name
+            if sources[i]:
+                base_name = f"{filename_prefix}{ts_str}_{sources[i]}_{number_str}"
+            else:
                 base_name = f"{filename_prefix}{ts_str}_{number_str}"
 
-                if filename_with_score and current_score is not None:
-                    base_name += f"_{int(current_score)}"
+            if filename_with_score and current_score is not None:
+                base_name += f"_{int(current_score)}"
+            names.append(base_name)
+
+        timings.lap("prepare")
+
+        # --- TAR SHARDS ---
+        if save_format in ("png_tar", "webp_tar"):
+            if async_save:
+                print("xx- FastSaver: Shards are written in order; saving this batch synchronously.")
+            workflow_ref = None
+            if save_workflow_metadata:
+                workflow_ref = self.save_workflow_file(output_path, filename_prefix, prompt, extra_pnginfo)
+            shards_before = sum(os.path.getsize(p) for p in self.shard_paths(output_path, filename_prefix))
+            self.save_tar_shards(images, output_path, filename_prefix, names, frame_indices, scores_list, sources,
+                                 metadata_key, save_format[:-4], webp_lossless, webp_quality, webp_method,
+                                 shard_size_mb * 1024 ** 2, workflow_ref, max_threads,
+                                 self.png_metadata(False, None, None), encoder, png_compression)
+            shards_after = sum(os.path.getsize(p) for p in self.shard_paths(output_path, filename_prefix))
+            timings.lap("tar", frames=batch_size, nbytes=shards_after - shards_before)
+            if counting:
+                self.store_counter(output_path, filename_prefix)
+            return {"ui": {"images": []}}
 
-                ext = ".webp" if save_format == "webp" else ".png"
-                full_path = os.path.join(output_path, f"{base_name}{ext}")
-                
-                futures.append(executor.submit(
-                    self.save_single_image, 
-                    img_tensor, full_path, current_score, metadata_key,
-                    save_format, webp_lossless, webp_quality, webp_method,
-                    save_workflow_metadata, prompt, extra_pnginfo
-                ))
+        print(f"xx- FastSaver: Saving {batch_size} images to {output_path}...")
+        png_meta = self.png_metadata(save_workflow_metadata, prompt, extra_pnginfo) if save_format == "png" else ()
+
+        # In the background mode the shared writer's bounded queue is the back-pressure
+        writer = _get_writer(max_threads, async_queue_frames) if async_save else None
+        batch = None
+        if writer is not None and counting:
+            batch = self.counter_batch(output_path, filename_prefix, batch_size)
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) if writer is None else contextlib.nullcontext()
+        # Busy time summed over the encoder threads (synchronous saves only)
+        save_fn = timings.timed("encode_write", self.save_single_image) if writer is None else self.save_single_image
+        paths = []
+
+        with pool as executor:
+            futures = []
+            # Converted chunks wait for the encoders; keep at most two of them ahead
+            in_flight = collections.deque()
+
+            chunks = timings.timed_iter("convert", _uint8_chunks(images, max(max_threads, 8) * 2),
+                                        count=lambda item: len(item[1]))
+            for start, chunk in chunks:
+                if len(in_flight) >= 2:
+                    concurrent.futures.wait(in_flight.popleft())
+                chunk_futures = []
+
+                for j, frame in enumerate(chunk):
+                    i = start + j
+                    current_score = scores_list[i] if scores_list else None
+                    ext = ".webp" if save_format == "webp" else ".png"
+                    full_path = os.path.join(output_path, f"{names[i]}{ext}")
+                    paths.append(full_path)
+
+                    job = (frame, full_path, current_score, metadata_key,
+                           save_format, webp_lossless, webp_quality, webp_method,
+                           png_meta, encoder, png_compression)
+                    if writer is not None:
+                        writer.submit(full_path, save_fn, *job, batch=batch)
+                    else:
+                        chunk_futures.append(executor.submit(save_fn, *job))
+
+                in_flight.append(chunk_futures)
+                futures.extend(chunk_futures)
+                timings.gauge("chunks_in_flight", len(in_flight))
+                if writer is not None:
+                    timings.gauge("writer_pending", writer.pending())
 
             concurrent.futures.wait(futures)
 
+        if writer is not None:
+            timings.lap("queue", frames=batch_size)
+        else:
+            timings.lap("save", frames=batch_size,
+                        nbytes=sum(os.path.getsize(p) for p in paths if os.path.exists(p)))
+
+        if writer is not None:
+            print(f"xx- FastSaver: Queued for background saving ({writer.pending()} writes pending).")
+        elif counting:
+            self.store_counter(output_path, filename_prefix)
         return {"ui": {"images": []}}
\ No newline at end of file
@@ -0,0 +1,232 @@
+import cv2
+import concurrent.futures
+import multiprocessing
+import pickle
+import os
+import glob
+from concurrent.futures.process import BrokenProcessPool
+from .score_index import ScoreIndex
+from .frame_selection import CandidatePool, select_pairs
+from .sharpness_metrics import METRICS, REGIONS, AGGREGATES
+from .parallel_loader import OUTPUT_DTYPES, ParallelSharpnessLoader, _to_image_batch
+from .instrumentation import Timings, instrumented
+
+VIDEO_EXTENSIONS = "mp4,mov,mkv,avi,webm,m4v"
+
+
+def _find_videos(folder_or_glob, extensions, recursive):
+    """Sorted video files in a folder (filtered by extension) or matching a glob pattern."""
+    path = folder_or_glob.strip().strip('"')
+    if os.path.isdir(path):
+        exts = {"." + e.strip().lower().lstrip(".") for e in extensions.split(",") if e.strip()}
+        pattern = os.path.join(path, "**", "*") if recursive else os.path.join(path, "*")
+        files = [f for f in glob.glob(pattern, recursive=recursive) if os.path.splitext(f)[1].lower() in exts]
+        root = path
+    else:
+        files = glob.glob(path, recursive=recursive)
+        root = os.path.dirname(path.split("*")[0])
+    return sorted(f for f in files if os.path.isfile(f)), root
+
+
+def _scan_file(video_path, options):
+    """Score one video and return its best candidates. Runs in a worker process or thread.
+
+    Returns (video_path, [(frame_idx, score)] best first, error message or None,
+    per-stage timings). Only scores travel back to the parent; frames are decoded
+    there after selection.
+    """
+    timings = Timings("scan_file")
+    try:
+        loader = ParallelSharpnessLoader()
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        if total_frames <= 0:
+            return video_path, [], "no frames", {}
+
+        step = options["frame_scan_step"]
+        samples_fn, score_fn, metric, keyframes = loader.make_scanner(
+            video_path, fps, width, height, step, options["scan_threads"], options["decode_backend"],
+            options["scan_scale"], False, options["sharpness_metric"], options["score_region"],
+            options["tile_grid"], options["tile_aggregate"], options["reject_below"])
+        samples_fn = timings.timed_source("scan_decode", samples_fn)
+        score_fn = timings.timed("scan_score", score_fn)
+        index = ScoreIndex(video_path, step, metric, options["score_index_dir"]) if options["use_score_index"] else None
+
+        # Same paging as the loader's whole-video mode: a running selection
+        tracker = CandidatePool(options["return_count"], options["min_distance"], options["candidate_margin"])
+        page_span = options["scan_limit"] * step
+        try:
+            for page_start in range(0, total_frames, page_span):
+                page_scores = loader.scan_page(video_path, page_start, min(page_start + page_span, total_frames),
+                                               samples_fn, score_fn, index, None, keyframes, step,
+                                               options["scan_threads"], 1, "dense", 1,
+                                               options["return_count"], options["min_distance"], save_index=False)
+                tracker.offer_scores(page_scores)
+        finally:
+            if index is not None:
+                index.save()
+
+        pairs = select_pairs(tracker.scores(), options["return_count"], options["min_distance"])
+        return video_path, pairs, None, timings.as_dict()["stages"]
+    except Exception as e:
+        return video_path, [], str(e), timings.as_dict()["stages"]
+
+
+class ParallelSharpnessFolderLoader:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "folder_or_glob": ("STRING", {"default": "C:\\path\\to\\clips"}),
+                "frame_scan_step": ("INT", {"default": 5, "min": 1, "step": 1, "label": "Analyze Every Nth Frame"}),
+                "return_count": ("INT", {"default": 4, "min": 1, "max": 1024, "step": 1, "label": "Best Frames (Per File or Total)"}),
+                "min_distance": ("INT", {"default": 24, "min": 0, "max": 10000, "step": 1, "label": "Min Distance (Frames)"}),
+                "selection_mode": (["per_file", "global"], {"default": "per_file"}),
+                "max_workers": ("INT", {"default": 0, "min": 0, "max": 128, "step": 1, "label": "Files in Parallel (0=Auto)"}),
+            },
+            "optional": {
+                "extensions": ("STRING", {"default": VIDEO_EXTENSIONS, "label": "Extensions (Folder Mode)"}),
+                "recursive": ("BOOLEAN", {"default": False, "label": "Include Subfolders"}),
+                "pool_type": (["process", "thread"], {"default": "process"}),
+                "scan_limit": ("INT", {"default": 1440, "min": 1, "max": 10000000, "step": 1, "label": "Samples per Page"}),
+
+                "sharpness_metric": (METRICS, {"default": "laplacian"}),
+                "score_region": (REGIONS, {"default": "full"}),
+                "tile_grid": ("INT", {"default": 4, "min": 2, "max": 16, "step": 1, "label": "Tiles per Side"}),
+                "tile_aggregate": (AGGREGATES, {"default": "max"}),
+                "reject_below": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 100000.0, "step": 1.0, "label": "Early Reject (Quick Score <)"}),
+
+                "use_score_index": ("BOOLEAN", {"default": False, "label": "Reuse Scores (Sidecar Index)"}),
+                "score_index_dir": ("STRING", {"default": "", "label": "Index Folder (Empty = Next to Video)"}),
+                "candidate_margin": ("INT", {"default": 8, "min": 0, "max": 1024, "step": 1, "label": "Extra Candidates Kept"}),
+
+                "decode_backend": (["opencv", "ffmpeg_gray"], {"default": "opencv"}),
+                "scan_scale": ("FLOAT", {"default": 1.0, "min": 0.05, "max": 1.0, "step": 0.05, "label": "Scan Resolution Scale (ffmpeg)"}),
+                "output_dtype": (OUTPUT_DTYPES, {"default": "float32"}),
+                "profile_dir": ("STRING", {"default": "", "label": "cProfile Dump Folder (Empty = Off)"}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", "STRING", "INT", "STRING", "STRING")
+    RETURN_NAMES = ("images", "scores_info", "file_count", "batch_status", "timings")
+    FUNCTION = "load_folder"
+    CATEGORY = "BetaHelper/Video"
+
+    def scan_files(self, files, options, max_workers, pool_type, timings=None):
+        """Run `_scan_file` over `files`, `max_workers` at a time. Returns {path: [(frame_idx, score)]}.
+
+        A process pool keeps every core busy on many short clips (decoding and
+        scoring both hold the GIL in parts). If worker processes cannot be started
+        or cannot import this package, the remaining files are scanned on threads.
+        """
+        results = {}
+
+        def collect(future):
+            path, pairs, error, stages = future.result()
+            if timings is not None:
+                timings.merge(stages)
+            if error:
+                print(f"xx- Folder Loader | Skipping {os.path.basename(path)}: {error}")
+            results[path] = pairs
+
+        if pool_type == "process" and len(files) > 1:
+            try:
+                context = multiprocessing.get_context("spawn")
+                with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+                    futures = [executor.submit(_scan_file, path, options) for path in files]
+                    for future in concurrent.futures.as_completed(futures):
+                        collect(future)
+            except (BrokenProcessPool, pickle.PicklingError, ImportError, AttributeError, OSError) as e:
+                print(f"xx- Folder Loader | Process pool unavailable ({type(e).__name__}: {e}), using threads.")
+
+        remaining = [path for path in files if path not in results]
+        if remaining:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_scan_file, path, options) for path in remaining]
+                for future in concurrent.futures.as_completed(futures):
+                    collect(future)
+        return results
+
+    @instrumented("ParallelSharpnessFolderLoader")
+    def load_folder(self, folder_or_glob, frame_scan_step, return_count, min_distance, selection_mode, max_workers,
+                    extensions=VIDEO_EXTENSIONS, recursive=False, pool_type="process", scan_limit=1440,
+                    sharpness_metric="laplacian", score_region="full", tile_grid=4, tile_aggregate="max",
+                    reject_below=0.0, use_score_index=False, score_index_dir="", candidate_margin=8,
+                    decode_backend="opencv", scan_scale=1.0, output_dtype="float32", timings=None):
+
+        # 1. Discovery
+        files, root = _find_videos(folder_or_glob, extensions, recursive)
+        if not files:
+            raise FileNotFoundError(f"No videos found for: {folder_or_glob}")
+        timings.lap("discover")
+        timings.gauge("files", len(files))
+
+        cpus = os.cpu_count() or 4
+        if max_workers == 0:
+            max_workers = cpus
+        max_workers = min(max_workers, len(files))
+
+        status_msg = f"Scanning {len(files)} videos on {max_workers} {pool_type} workers ({selection_mode})."
+        print(f"xx- Folder Loader | {status_msg}")
+
+        # 2. Scanning: each worker scores one file; cores are shared between workers
+        options = {
+            "frame_scan_step": frame_scan_step, "return_count": return_count, "min_distance": min_distance,
+            "candidate_margin": candidate_margin, "scan_limit": scan_limit,
+            "scan_threads": max(1, cpus // max_workers),
+            "decode_backend": decode_backend, "scan_scale": scan_scale,
+            "sharpness_metric": sharpness_metric, "score_region": score_region, "tile_grid": tile_grid,
+            "tile_aggregate": tile_aggregate, "reject_below": reject_below,
+            "use_score_index": use_score_index, "score_index_dir": score_index_dir,
+        }
+        results = self.scan_files(files, options, max_workers, pool_type, timings)
+        timings.lap("scan")
+        timings.gauge("workers", max_workers)
+
+        # 3. Selection
+        # `min_distance` only applies within a file, so each file's greedy picks are
+        # already in global greedy order: the global best N are simply the top N of them.
+        if selection_mode == "global":
+            ranked = sorted(((score, -i, path, idx) for i, path in enumerate(files)
+                             for idx, score in results.get(path, [])), reverse=True)[:return_count]
+            chosen = {path: [] for path in files}
+            for score, _, path, idx in ranked:
+                chosen[path].append((idx, score))
+        else:
+            chosen = {path: list(results.get(path, [])) for path in files}
+
+        selected = [(path, idx, score) for path in files for idx, score in sorted(chosen[path])]
+        if not selected:
+            raise ValueError(f"No frames found in {len(files)} videos. The videos might be corrupted or blank.")
+        timings.lap("select", frames=len(selected))
+
+        # 4. Extraction, one seek pass per file
+        loader = ParallelSharpnessLoader()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {path: executor.submit(loader.read_frames, path, sorted(idx for idx, _ in chosen[path]))
+                       for path in files if chosen[path]}
+            frames = {path: future.result() for path, future in futures.items()}
+        timings.lap("extract_decode", frames=sum(len(f) for f in frames.values()))
+
+        output_frames = []
+        info_log = []
+
+        for path, idx, score in selected:
+            frame = frames[path].get(idx)
+            if frame is None:
+                continue
+            output_frames.append(frame)
+            source = os.path.relpath(path, root) if root else os.path.basename(path)
+            info_log.append(f"F:{idx} (Score:{int(score)}, Src:{source})")
+
+        if not output_frames:
+            raise ValueError("Frames were selected but could not be loaded. This indicates a file read error.")
+
+        # One IMAGE batch needs one size: later clips are fitted to the first frame
+        images = _to_image_batch(output_frames, output_dtype)
+        timings.lap("to_tensor", frames=len(output_frames), nbytes=images.element_size() * images.nelement())
+        return (images, ", ".join(info_log), len(files), status_msg)
@@ -0,0 +1,91 @@
+import os
+import hashlib
+import numpy as np
+from .score_index import video_identity
+
+# Bump when the on-disk layout of a cached frame changes.
+CACHE_VERSION = 1
+
+
+class FrameCache:
+    """On-disk cache of decoded uint8 frames, keyed by video identity and frame index.
+
+    Each frame is one `.npy` file (a raw uint8 array behind a small header) in a
+    folder per video, opened memory-mapped: a hit is copied by the consumer
+    straight from the page cache into its output, with no decode. Total size is
+    capped at `max_bytes`; a hit refreshes the file's mtime and the oldest files
+    are evicted first (LRU).
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir.strip('"')
+        self.max_bytes = max_bytes
+
+    def _folder(self, video_path):
+        key = f"{CACHE_VERSION}|{video_identity(video_path)}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{os.path.basename(video_path)}.{digest}")
+
+    def get_many(self, video_path, indices):
+        """{idx: read-only memory-mapped BGR frame} for every cached index."""
+        folder = self._folder(video_path)
+        frames = {}
+        for idx in indices:
+            path = os.path.join(folder, f"{idx}.npy")
+            if not os.path.isfile(path):
+                continue
+            try:
+                frames[idx] = np.load(path, mmap_mode="r")
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                print(f"xx- Frame Cache | Ignoring unreadable frame {path}: {e}")
+        return frames
+
+    def put_many(self, video_path, frames):
+        """Store {idx: uint8 frame}, then evict the least recently used files over the cap."""
+        if not frames:
+            return
+        folder = self._folder(video_path)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            for idx, frame in frames.items():
+                path = os.path.join(folder, f"{idx}.npy")
+                if os.path.isfile(path):
+                    continue
+                tmp_path = path + ".tmp.npy"
+                np.save(tmp_path, np.ascontiguousarray(frame))
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"xx- Frame Cache | Could not write to {folder}: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime_ns, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        files.sort()
+        removed = 0
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped by a consumer (Windows); it goes on a later run
+                continue
+            total -= size
+            removed += 1
+        print(f"xx- Frame Cache | Evicted {removed} frames, {total / 1024 ** 3:.2f} GB in use.")
@@ -0,0 +1,236 @@
+import bisect
+import numpy as np
+
+
+def select_min_distance(frames, scores, count, min_distance):
+    """Greedy best-first pick of up to `count` frames that are `min_distance` apart.
+
+    `frames` are frame indices (or batch positions) and `scores` their scores.
+    Returns positions into the inputs, best first. Ties go to the earlier input.
+
+    Only the best candidates are sorted (`np.argpartition`, grown if the distance
+    rule rejects too many), and each distance check is a bisect into the sorted
+    list of picked frames, so a whole-movie index of millions of scores is
+    selected in milliseconds rather than O(N * count) Python comparisons.
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    if n == 0 or count <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    budget = min(n, max(count * 4, 64))
+    while True:
+        if budget < n:
+            threshold = scores[np.argpartition(-scores, budget - 1)[budget - 1]]
+            # Everything tied with the cut-off is included, keeping tie order exact
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(n)
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        if min_distance <= 1:
+            return candidates[:count]
+
+        picked = []
+        taken = []
+        for pos, frame in zip(candidates.tolist(), frames[candidates].tolist()):
+            j = bisect.bisect_left(taken, frame)
+            if j > 0 and frame - taken[j - 1] < min_distance:
+                continue
+            if j < len(taken) and taken[j] - frame < min_distance:
+                continue
+            taken.insert(j, frame)
+            picked.append(pos)
+            if len(picked) >= count:
+                break
+
+        if len(picked) >= count or len(candidates) >= n:
+            return np.array(picked, dtype=np.int64)
+        budget = min(n, budget * 4)
+
+
+def select_pairs(frame_scores, count, min_distance):
+    """`select_min_distance` for a list of (frame_idx, score) pairs; returns pairs, best first."""
+    if not frame_scores:
+        return []
+    frames, scores = zip(*frame_scores)
+    return [frame_scores[i] for i in select_min_distance(frames, scores, count, min_distance).tolist()]
+
+
+def best_per_block(scores, block_size, gap=0):
+    """Position of the best score in each `block_size` block, blocks starting every `block_size + gap`.
+
+    Done as one reshape + argmax: the scores are padded with -inf to whole strides.
+    Returns (positions, best_scores).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    stride = block_size + gap
+    blocks = -(-len(scores) // stride)
+    padded = np.full(blocks * stride, -np.inf)
+    padded[:len(scores)] = scores
+    table = padded.reshape(blocks, stride)[:, :block_size]
+    best = table.argmax(axis=1)
+    return np.arange(blocks) * stride + best, table[np.arange(blocks), best]
+
+
+class CandidatePool:
+    """Running selection over a stream of scores, holding decoded frames for the best.
+
+    The scores of every frame that can still win the final greedy `min_distance`
+    selection are kept, so `select_pairs(pool.scores(), ...)` equals the selection
+    over everything offered. Frames are only held for the current picks plus
+    `margin` runners-up (`count + margin` at most); winners without a held frame
+    are re-decoded by the caller. Frames are kept by reference; callers hand in
+    arrays they own.
+
+    A frame is dropped once `count` better frames are pairwise at least
+    `2 * min_distance - 1` apart. Each greedy pick only suppresses frames within
+    `min_distance` of itself, which covers at most one of those, so whatever is
+    offered later the selection takes `count` frames before reaching the dropped one.
+    """
+
+    def __init__(self, count, min_distance, margin):
+        self.count = count
+        self.min_distance = min_distance
+        self.capacity = count + margin
+        self.entries = {}
+        self._floor = None
+        self._frame_floor = None
+        self._framed = 0
+        self._limit = self.capacity
+
+    def _below(self, floor, idx, score):
+        # Greedy order: higher score first, the earlier frame on ties
+        return floor is not None and (score < floor[0] or (score == floor[0] and idx > floor[1]))
+
+    def offer(self, idx, score, frame):
+        if self._below(self._floor, idx, score):
+            return
+        old = self.entries.get(idx)
+        if old is not None and old[1] is not None:
+            self._framed -= 1
+        if self._below(self._frame_floor, idx, score):
+            # Weaker than every held frame: keep the score, the frame is re-decoded if it wins
+            frame = None
+        self.entries[idx] = (score, frame)
+        if frame is not None:
+            self._framed += 1
+        if len(self.entries) > self._limit or self._framed > self.capacity:
+            self._prune()
+
+    def offer_scores(self, frame_scores):
+        """Offer (frame_idx, score) pairs without frames, pruning once at the end.
+
+        Frames already held keep their decoded frame. This makes the pool a running
+        selection over a whole movie, page by page.
+        """
+        for idx, score in frame_scores:
+            if self._below(self._floor, idx, score):
+                continue
+            if idx not in self.entries:
+                self.entries[idx] = (score, None)
+        if len(self.entries) > self._limit:
+            self._prune()
+
+    def scores(self):
+        """(frame_idx, score) pairs currently held, sorted by frame index."""
+        return [(idx, self.entries[idx][0]) for idx in sorted(self.entries)]
+
+    def _prune(self):
+        frames = sorted(self.entries)
+        scores = [self.entries[idx][0] for idx in frames]
+        order = np.lexsort((frames, -np.asarray(scores))).tolist()
+
+        # Scores: everything above the count-th frame of a selection twice as far apart
+        spaced = select_min_distance(frames, scores, self.count, 2 * self.min_distance - 1).tolist()
+        if len(spaced) >= self.count:
+            last = spaced[-1]
+            self._floor = (scores[last], frames[last])
+            order = order[:order.index(last) + 1]
+
+        # Frames: the current picks plus the best runners-up
+        selected = select_min_distance(frames, scores, self.count, self.min_distance).tolist()
+        framed = set(selected)
+        for i in order:
+            if len(framed) >= self.capacity:
+                break
+            framed.add(i)
+
+        entries = {}
+        for i in order:
+            score, frame = self.entries[frames[i]]
+            entries[frames[i]] = (score, frame if i in framed else None)
+        self.entries = entries
+        self._framed = sum(1 for _, frame in entries.values() if frame is not None)
+        if len(framed) >= self.capacity:
+            rank = {i: r for r, i in enumerate(order)}
+            weakest = max(framed, key=rank.__getitem__)
+            self._frame_floor = (scores[weakest], frames[weakest])
+        # Amortized: entries above the floor are not bounded by the capacity
+        self._limit = max(self.capacity, 2 * len(entries))
+
+    def get(self, idx):
+        entry = self.entries.get(idx)
+        return None if entry is None else entry[1]
+
+
+def shot_starts(cuts, first, min_length):
+    """Sorted first frames of each shot: `first`, then every cut at least `min_length` frames after the previous start."""
+    starts = [first]
+    for cut in sorted(cuts):
+        if cut - starts[-1] >= min_length:
+            starts.append(cut)
+    return starts
+
+
+def _group_by_shot(frame_scores, starts):
+    groups = {}
+    for idx, score in frame_scores:
+        shot = starts[max(0, bisect.bisect_right(starts, idx) - 1)]
+        groups.setdefault(shot, []).append((idx, score))
+    return groups
+
+
+def select_per_shot(frame_scores, starts, count, min_distance, total):
+    """Best `count` frames (`min_distance` apart) of every shot, `total` at most.
+
+    When the cap bites, shots take turns: every shot's best frame comes before
+    any shot's second best, the better shots first within each round.
+    `starts` comes from `shot_starts`. Returns pairs in that order.
+    """
+    groups = _group_by_shot(frame_scores, starts)
+    ranked = []
+    for shot in sorted(groups):
+        for rank, (idx, score) in enumerate(select_pairs(groups[shot], count, min_distance)):
+            ranked.append((rank, -score, idx))
+    ranked.sort()
+    return [(idx, -neg_score) for _, neg_score, idx in ranked[:total]]
+
+
+class ShotPools:
+    """Running per-shot selection: one `CandidatePool` of scores per shot.
+
+    Only the scores that can still win are kept per shot, however long each shot is. Shot
+    starts only ever gain later cuts, so frames grouped on an earlier page stay in
+    the right shot.
+    """
+
+    def __init__(self, count, min_distance, margin):
+        self.count = count
+        self.min_distance = min_distance
+        self.margin = margin
+        self.pools = {}
+
+    def offer_scores(self, frame_scores, starts):
+        for shot, pairs in _group_by_shot(frame_scores, starts).items():
+            pool = self.pools.get(shot)
+            if pool is None:
+                pool = self.pools[shot] = CandidatePool(self.count, self.min_distance, self.margin)
+            pool.offer_scores(pairs)
+
+    def scores(self):
+        """(frame_idx, score) pairs held across all shots, sorted by frame index."""
+        return sorted(pair for pool in self.pools.values() for pair in pool.scores())
@@ -0,0 +1,145 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+
+class Timings:
+    """Per-stage wall time, frame and byte counts and queue-depth peaks for one node run.
+
+    Stages recorded with `lap` are sequential phases of the node function and add
+    up to the total. Stages recorded from worker threads (`timed`, `timed_iter`)
+    are summed over all threads: with N workers busy they can exceed the total,
+    and comparing them shows which side (decode, score, encode) is the bottleneck.
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.stages = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._start = self._last = time.perf_counter()
+
+    def add(self, name, seconds=0.0, frames=0, nbytes=0, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "frames": 0, "bytes": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += calls
+            stage["frames"] += frames
+            stage["bytes"] += nbytes
+
+    def lap(self, name, frames=0, nbytes=0):
+        """Record the time since the previous lap (or the start) as stage `name`."""
+        now = time.perf_counter()
+        self.add(name, now - self._last, frames, nbytes)
+        self._last = now
+
+    def gauge(self, name, value):
+        """Keep the peak of a queue depth or similar level."""
+        with self._lock:
+            self.gauges[name] = max(self.gauges.get(name, value), value)
+
+    def timed(self, name, fn):
+        """`fn` wrapped to record each call as one frame of stage `name`."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start, 1)
+        return wrapper
+
+    def timed_iter(self, name, iterable, count=None):
+        """Yield from `iterable`, recording the time spent producing each item.
+
+        Each item counts as one frame, or as `count(item)` frames. Closing this
+        generator closes the underlying one.
+        """
+        it = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    self.add(name, time.perf_counter() - start, calls=0)
+                    return
+                self.add(name, time.perf_counter() - start, count(item) if count else 1)
+                yield item
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    def timed_source(self, name, fn):
+        """`fn` (returning an iterable of frames) wrapped so that iterating its result is timed."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.timed_iter(name, fn(*args, **kwargs))
+        return wrapper
+
+    def merge(self, stages, prefix=""):
+        """Add stages recorded elsewhere (e.g. `as_dict()["stages"]` from a worker process)."""
+        for name, stage in stages.items():
+            self.add(prefix + name, stage["seconds"], stage["frames"], stage["bytes"], stage["calls"])
+
+    def as_dict(self):
+        with self._lock:
+            stages = {name: dict(stage, seconds=round(stage["seconds"], 4)) for name, stage in self.stages.items()}
+            gauges = dict(self.gauges)
+        for stage in stages.values():
+            if stage["frames"] and stage["seconds"] > 0:
+                stage["fps"] = round(stage["frames"] / stage["seconds"], 1)
+        return {"node": self.node, "total_s": round(time.perf_counter() - self._start, 4),
+                "stages": stages, "gauges": gauges}
+
+    def to_json(self):
+        return json.dumps(self.as_dict())
+
+
+def _dump_profile(profiler, profile_dir, node):
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        base = os.path.join(profile_dir, f"{node}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}")
+        profiler.dump_stats(base + ".prof")
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        print(f"xx- Profiler | {node}: wrote {base}.prof")
+    except OSError as e:
+        print(f"xx- Profiler | Could not write profile to {profile_dir}: {e}")
+
+
+def instrumented(node):
+    """Decorator for a node's FUNCTION: passes a fresh `Timings` as `timings=` and appends its JSON as the last output.
+
+    Also consumes the optional `profile_dir` input: when set, the run is profiled
+    with cProfile (calling thread only) and the stats are dumped there as
+    `.prof` (for pstats/snakeviz) plus a `.txt` summary.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, profile_dir="", **kwargs):
+            timings = Timings(node)
+            profiler = cProfile.Profile() if profile_dir else None
+            if profiler is not None:
+                profiler.enable()
+            try:
+                result = fn(self, *args, timings=timings, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    _dump_profile(profiler, profile_dir.strip().strip('"'), node)
+
+            if isinstance(result, dict):
+                result["result"] = tuple(result.get("result", ())) + (timings.to_json(),)
+                return result
+            return tuple(result) + (timings.to_json(),)
+        return wrapper
+    return decorate
@@ -3,6 +3,423 @@ import torch
 import numpy as np
 import concurrent.futures
 import os
+import bisect
+import collections
+import functools
+import subprocess
+import threading
+from .score_index import ScoreIndex
+from .frame_cache import FrameCache
+from .dedup_index import HashIndex, dhash, hamming, index_path
+from .frame_selection import CandidatePool, ShotPools, select_pairs, select_per_shot, shot_starts
+from .sharpness_metrics import METRICS, REGIONS, AGGREGATES, metric_key, score_frame
+from .fast_saver import _get_ffmpeg
+from .instrumentation import instrumented
+
+_KEYFRAME_CACHE = {}
+
+OUTPUT_DTYPES = ["float32", "float16", "uint8"]
+
+# A seek costs about this many decoded frames on top of decoding from the keyframe
+_SEEK_COST = 8
+# Starting another ffmpeg process at a sample costs about this many decoded frames
+_SPAWN_COST = 32
+# Repositioning cv2's reader costs about this many decoded frames (it flushes and resyncs the decoder)
+_CV_SEEK_COST = 48
+# Below this many extraction reads, a keyframe probe is not worth its demux pass
+_PROBE_MIN_READS = 16
+# The keyframe probe demuxes about this many packets in the time one frame decodes
+_DEMUX_PER_DECODE = 32
+
+
+def _missing_runs(wanted, missing):
+    """Group `missing` frames into (start, count) runs of consecutive entries of `wanted`."""
+    runs = []
+    for pos in np.searchsorted(wanted, missing).tolist():
+        if runs and pos == runs[-1][2] + runs[-1][1]:
+            runs[-1][1] += 1
+        else:
+            runs.append([int(wanted[pos]), 1, pos])
+    return [(start, count) for start, count, _ in runs]
+
+
+def _keyframe_key(video_path):
+    st = os.stat(video_path)
+    return os.path.abspath(video_path), st.st_size, st.st_mtime_ns
+
+
+def _probe_keyframes(video_path):
+    """Return the sorted display indices of the video's keyframes, or None if unknown.
+
+    Uses ffmpeg's framecrc muxer on a stream copy, so nothing is decoded: every
+    packet is listed with its pts and non-key packets carry an `F=` flag field.
+    Only a locally available ffmpeg is used; this never triggers a download.
+    """
+    key = _keyframe_key(video_path)
+    if key in _KEYFRAME_CACHE:
+        return _KEYFRAME_CACHE[key]
+
+    keyframes = None
+    ffmpeg_path = _get_ffmpeg(allow_download=False)
+    if ffmpeg_path:
+        cmd = [ffmpeg_path, "-v", "error", "-i", video_path, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+        try:
+            out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+            packets = []
+            for line in out.decode("ascii", "ignore").splitlines():
+                if not line or line.startswith("#"):
+                    continue
+                fields = [f.strip() for f in line.split(",")]
+                flags = 1
+                if len(fields) > 6 and fields[6].startswith("F="):
+                    flags = int(fields[6][2:], 16)
+                packets.append((int(fields[2]), flags & 1))
+            # Packets arrive in decode order; a frame's display index is its pts rank
+            packets.sort()
+            keyframes = [i for i, (_, is_key) in enumerate(packets) if is_key]
+        except (OSError, ValueError, IndexError, subprocess.CalledProcessError) as e:
+            print(f"xx- Parallel Loader | Keyframe probe failed: {e}")
+            keyframes = None
+
+    _KEYFRAME_CACHE[key] = keyframes or None
+    return _KEYFRAME_CACHE[key]
+
+
+def _keyframes_for_reads(video_path, reads, total_frames):
+    """Keyframes to plan `reads` extraction reads with, or None when probing would cost more than it saves.
+
+    The probe demuxes every packet of the file, so a few reads into a long video
+    are planned without it. A probe already done for this file is always used.
+    """
+    key = _keyframe_key(video_path)
+    if key in _KEYFRAME_CACHE:
+        return _KEYFRAME_CACHE[key]
+    if reads < _PROBE_MIN_READS or reads * _SEEK_COST * _DEMUX_PER_DECODE < total_frames:
+        return None
+    return _probe_keyframes(video_path)
+
+
+def _split_runs(runs, step, parts, keyframes=None, min_samples=32):
+    """Cut (start, count) runs into roughly `parts` segments for parallel decoders.
+
+    With known keyframes each cut is moved to the first sample at or after a
+    keyframe, so a decoder seeking to its segment start wastes no decoding.
+    """
+    total = sum(count for _, count in runs)
+    target = max(min_samples, -(-total // parts))
+    segments = []
+    for start, count in runs:
+        cuts = [0]
+        offset = target
+        while offset < count:
+            if keyframes:
+                k = bisect.bisect_left(keyframes, start + offset * step)
+                if k < len(keyframes):
+                    offset = -(-(keyframes[k] - start) // step)
+                else:
+                    break
+            if offset >= count:
+                break
+            cuts.append(offset)
+            offset += target
+        cuts.append(count)
+        for a, b in zip(cuts, cuts[1:]):
+            segments.append((start + a * step, b - a))
+    return segments
+
+
+def _to_image_batch(frames, output_dtype="float32"):
+    """Write BGR uint8 frames straight into one preallocated (N, H, W, 3) IMAGE tensor.
+
+    float32/float16 hold RGB in 0-1; uint8 keeps the decoded 0-255 values. Frames
+    of another size are fitted to the first one.
+    """
+    h, w = frames[0].shape[:2]
+    dtype = {"float32": torch.float32, "float16": torch.float16, "uint8": torch.uint8}[output_dtype]
+    out = torch.empty((len(frames), h, w, 3), dtype=dtype)
+    view = out.numpy()
+    rgb = np.empty((h, w, 3), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        if frame.shape[:2] != (h, w):
+            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        if dtype == torch.uint8:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=view[i])
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+            np.divide(rgb, np.float32(255.0), out=view[i], dtype=np.float32, casting="unsafe")
+    return out
+
+
+def _plan_reads(indices, keyframes=None, max_gap=24, seek_cost=_SEEK_COST):
+    """Decide for each target in sorted `indices` whether to seek or grab forward.
+
+    Returns [(idx, seek)]. A seek decodes from the keyframe at or before the
+    target, so grabbing forward from the reader's position is cheaper whenever
+    that position is not far before that keyframe. Without known keyframes,
+    gaps up to `max_gap` frames are grabbed.
+    """
+    plan = []
+    position = 0
+    for idx in indices:
+        gap = idx - position
+        if gap < 0:
+            seek = True
+        elif gap == 0:
+            seek = False
+        elif keyframes:
+            k = bisect.bisect_right(keyframes, idx) - 1
+            key = keyframes[k] if k >= 0 else 0
+            seek = gap > idx - key + seek_cost
+        else:
+            seek = gap > max_gap
+        plan.append((idx, seek))
+        position = idx + 1
+    return plan
+
+
+def _seek_runs(runs, step, keyframes, seek_cost=_SEEK_COST):
+    """Split (start, count) runs wherever seeking to a sample beats decoding the frames before it.
+
+    Decided by `_plan_reads` with the video's `keyframes`, so a stride longer than
+    the GOP decodes about one GOP per sample instead of every frame. Without
+    keyframes the runs are returned as they are.
+    """
+    if not keyframes or step <= 1:
+        return runs
+    split = []
+    for start, count in runs:
+        first, taken = start, 0
+        for idx, seek in _plan_reads(range(start, start + count * step, step), keyframes, seek_cost=seek_cost):
+            if seek and taken:
+                split.append((first, taken))
+                first, taken = idx, 0
+            taken += 1
+        split.append((first, taken))
+    return split
+
+
+def _opencv_samples(video_path, runs, step, seek_keyframes=None):
+    """Yield (frame_idx, BGR frame) for each (start, count) run, sampling every `step` frames.
+
+    With `seek_keyframes` (sorted keyframe indices), sparse samples are reached by
+    seeking instead of grabbing every frame in between.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        yield from _read_samples(cap, _seek_runs(runs, step, seek_keyframes, _CV_SEEK_COST), step)
+    finally:
+        cap.release()
+
+
+def _read_samples(cap, runs, step):
+    position = 0
+    for start, count in runs:
+        if start != position:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+        current_frame = start
+        read = 0
+        while read < count:
+            ret, frame = cap.read()
+            if not ret: break
+
+            yield current_frame, frame
+            read += 1
+
+            # Manual Stepping (not past the run's last sample)
+            if step > 1 and read < count:
+                for _ in range(step - 1):
+                    if not cap.grab(): break
+                    current_frame += 1
+
+            current_frame += 1
+
+        position = current_frame
+
+
+def _ffmpeg_samples(video_path, runs, step, fps, size, keyframes=None, ring=8, seek_keyframes=None):
+    """Yield (frame_idx, gray frame) for each (start, count) run, decoded by ffmpeg.
+
+    ffmpeg outputs luma only (`-pix_fmt gray`) at `size`, so there is no BGR
+    conversion. Frames are `np.frombuffer` views over a ring of `ring` reused
+    buffers: a consumer keeping more than `ring - 1` frames alive must copy them.
+    With `keyframes` (sorted keyframe indices) each run counts keyframes and the
+    decoder skips every non-key frame (`-skip_frame nokey`). With `seek_keyframes`,
+    sparse samples get their own seeking ffmpeg process where that beats decoding
+    every frame in between.
+    """
+    ffmpeg_path = _get_ffmpeg()
+    w, h = size
+    frame_bytes = w * h
+    buffers = [bytearray(frame_bytes) for _ in range(ring)]
+    slot = 0
+    if keyframes is None:
+        runs = _seek_runs(runs, step, seek_keyframes, _SPAWN_COST)
+
+    for start, count in runs:
+        cmd = [ffmpeg_path, "-v", "error"]
+        if keyframes is not None:
+            cmd += ["-skip_frame", "nokey"]
+        if start > 0:
+            cmd += ["-ss", f"{start / fps:.6f}"]
+        cmd += ["-i", video_path, "-map", "0:v:0", "-an", "-sn"]
+
+        filters = []
+        if keyframes is None and step > 1:
+            filters.append(f"select=not(mod(n\\,{step}))")
+        filters.append(f"scale={w}:{h}:flags=area")
+        cmd += ["-vf", ",".join(filters), "-vsync", "0", "-frames:v", str(count),
+                "-f", "rawvideo", "-pix_fmt", "gray", "-"]
+
+        if keyframes is not None:
+            first = bisect.bisect_left(keyframes, start)
+            indices = keyframes[first:first + count]
+        else:
+            indices = range(start, start + count * step, step)
+
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_bytes)
+        try:
+            for idx in indices:
+                buf = buffers[slot]
+                if proc.stdout.readinto(buf) != frame_bytes:
+                    break
+                slot = (slot + 1) % ring
+                yield idx, np.frombuffer(buf, dtype=np.uint8).reshape(h, w)
+        finally:
+            proc.stdout.close()
+            proc.kill()
+            proc.wait()
+
+
+def _hashing_source(samples_fn, hashes, hash_fn):
+    """`samples_fn` whose samples also store `hash_fn(frame)` in `hashes`, by frame index.
+
+    The hash is taken on the decoder's thread while the frame is still valid (ffmpeg
+    ring buffers are reused), so near-duplicate detection costs no extra decode.
+    """
+    @functools.wraps(samples_fn)
+    def wrapper(*args, **kwargs):
+        samples = samples_fn(*args, **kwargs)
+        try:
+            for idx, frame in samples:
+                hashes[idx] = hash_fn(frame)
+                yield idx, frame
+        finally:
+            samples.close()
+    return wrapper
+
+
+class _UniqueOffers:
+    """`pool` that ignores offers of frames whose hash is near the dedup index.
+
+    Such frames can never be returned, so they must not take the places of held
+    frames. Hashes are stored by `_hashing_source` before a frame is scored.
+    """
+
+    def __init__(self, pool, hashes, dedup):
+        self.pool = pool
+        self.hashes = hashes
+        self.dedup = dedup
+
+    def offer(self, idx, score, frame):
+        h = self.hashes.get(idx)
+        if h is None or not self.dedup.contains(h):
+            self.pool.offer(idx, score, frame)
+
+
+def _thumbnail(frame):
+    """32x18 int16 gray thumbnail of a BGR or gray frame, for cheap frame differences."""
+    small = cv2.resize(frame, (32, 18), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small.astype(np.int16)
+
+
+class _CutDetector:
+    """Shot cuts found in a dense scan: samples whose thumbnail differs from the previous sample's.
+
+    The difference is the mean absolute difference of `thumb_fn` thumbnails (0-255),
+    and a cut is recorded where it exceeds `threshold`. Each reader (`source`)
+    compares its own consecutive samples as it goes; `flush` then compares the
+    first sample of every reader with the last sample before it, carrying that
+    across pages, so cuts on a decoder segment or page boundary are found too.
+    """
+
+    def __init__(self, thumb_fn, threshold):
+        self.thumb_fn = thumb_fn
+        self.threshold = threshold
+        self.cuts = set()
+        self._ends = []
+        self._previous = None
+
+    def _differs(self, a, b):
+        return np.abs(a - b).mean() > self.threshold
+
+    def source(self, samples_fn):
+        """`samples_fn` whose samples are checked for cuts."""
+        @functools.wraps(samples_fn)
+        def wrapper(*args, **kwargs):
+            samples = samples_fn(*args, **kwargs)
+            first = previous = None
+            try:
+                for idx, frame in samples:
+                    thumb = self.thumb_fn(frame)
+                    if previous is None:
+                        first = (idx, thumb)
+                    elif self._differs(thumb, previous[1]):
+                        self.cuts.add(idx)
+                    previous = (idx, thumb)
+                    yield idx, frame
+            finally:
+                samples.close()
+                if first is not None:
+                    self._ends.append((first, previous))
+        return wrapper
+
+    def flush(self):
+        """Check the reader boundaries of everything scanned since the last flush."""
+        for (idx, thumb), (_, last) in sorted(self._ends, key=lambda ends: ends[0][0]):
+            if self._previous is not None and self._differs(thumb, self._previous):
+                self.cuts.add(idx)
+            self._previous = last
+        self._ends = []
+
+
+def _score_stream(executor, samples, score_fn, max_in_flight, timings=None):
+    """Score (idx, frame) samples on `executor`, yielding (idx, frame, score) in frame order.
+
+    At most `max_in_flight` frames are decoded but not yet handed back, so the
+    decoder blocks on the slowest worker instead of piling frames up in RAM.
+    """
+    pending = collections.deque()
+    for idx, frame in samples:
+        if len(pending) >= max_in_flight:
+            done_idx, done_frame, future = pending.popleft()
+            yield done_idx, done_frame, future.result()
+        pending.append((idx, frame, executor.submit(score_fn, frame)))
+        if timings is not None:
+            timings.gauge("scan_in_flight", len(pending))
+
+    while pending:
+        done_idx, done_frame, future = pending.popleft()
+        yield done_idx, done_frame, future.result()
+
+
+def _scan_segment(samples, score_fn, pool, lock):
+    """Decode and score one segment on its own reader. Returns [(idx, score)].
+
+    Candidates go straight into the shared `pool` under `lock`, so all segments
+    together hold one pool's worth of frames.
+    """
+    scores = []
+    for idx, frame in samples:
+        score = score_fn(frame)
+        scores.append((idx, score))
+        if pool is not None:
+            with lock:
+                pool.offer(idx, score, frame)
+    return scores
+
 
 class ParallelSharpnessLoader:
     @classmethod
@@ -21,18 +438,283 @@ class ParallelSharpnessLoader:
                 "min_distance": ("INT", {"default": 24, "min": 0, "max": 10000, "step": 1, "label": "Min Distance (Frames)"}),
                 "manual_skip_start": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "label": "Global Start Offset"}),
             },
+            "optional": {
+                "sharpness_metric": (METRICS, {"default": "laplacian"}),
+                "score_region": (REGIONS, {"default": "full"}),
+                "tile_grid": ("INT", {"default": 4, "min": 2, "max": 16, "step": 1, "label": "Tiles per Side"}),
+                "tile_aggregate": (AGGREGATES, {"default": "max"}),
+                "reject_below": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 100000.0, "step": 1.0, "label": "Early Reject (Quick Score <)"}),
+
+                # SCORE INDEX (re-runs only decode frames that were never scored)
+                "use_score_index": ("BOOLEAN", {"default": False, "label": "Reuse Scores (Sidecar Index)"}),
+                "score_index_dir": ("STRING", {"default": "", "label": "Index Folder (Empty = Next to Video)"}),
+
+                # SINGLE PASS (keep the best candidates while scanning instead of seeking back)
+                "single_pass": ("BOOLEAN", {"default": False, "label": "Single Pass (No Re-Decode)"}),
+                "candidate_margin": ("INT", {"default": 8, "min": 0, "max": 1024, "step": 1, "label": "Extra Candidates Kept in RAM"}),
+
+                # PERFORMANCE
+                "scan_threads": ("INT", {"default": 0, "min": 0, "max": 128, "step": 1, "label": "Scoring Threads (0=Auto)"}),
+                "decode_workers": ("INT", {"default": 1, "min": 1, "max": 128, "step": 1, "label": "Parallel Decoders (Segments)"}),
+
+                # DECODE BACKEND (ffmpeg_gray pipes luma-only rawvideo, optionally downscaled)
+                "decode_backend": (["opencv", "ffmpeg_gray"], {"default": "opencv"}),
+                "scan_scale": ("FLOAT", {"default": 1.0, "min": 0.05, "max": 1.0, "step": 0.05, "label": "Scan Resolution Scale (ffmpeg)"}),
+                "keyframes_only": ("BOOLEAN", {"default": False, "label": "Keyframes Only Pre-Scan (ffmpeg)"}),
+
+                # ADAPTIVE SAMPLING (coarse pass first, dense pass around the best hits)
+                "scan_strategy": (["dense", "coarse_to_fine"], {"default": "dense"}),
+                "coarse_factor": ("INT", {"default": 8, "min": 2, "max": 1000, "step": 1, "label": "Coarse Stride (x Scan Step)"}),
+
+                # WHOLE VIDEO (one execution, global best frames instead of one batch per run)
+                "scan_mode": (["batch", "whole_video"], {"default": "batch"}),
+                "scan_end_frame": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "label": "Stop At Frame (0=End)"}),
+                "report_pages": ("BOOLEAN", {"default": False, "label": "Report Best Frames Per Page"}),
+
+                # OUTPUT (float16 halves and uint8 quarters the memory of large batches)
+                "output_dtype": (OUTPUT_DTYPES, {"default": "float32"}),
+
+                # FRAME CACHE (re-runs of the same batch skip decoding the selected frames)
+                "frame_cache_dir": ("STRING", {"default": "", "label": "Frame Cache Folder (Empty = Off)"}),
+                "frame_cache_gb": ("FLOAT", {"default": 4.0, "min": 0.1, "max": 4096.0, "step": 0.5, "label": "Frame Cache Size (GB)"}),
+
+                # NEAR-DUPLICATES (perceptual hashes of returned frames, kept per dataset across runs)
+                "dedup_index": ("STRING", {"default": "", "label": "Dedup Index (Dataset Folder or .npy, Empty = Off)"}),
+                "dedup_threshold": ("INT", {"default": 6, "min": 0, "max": 16, "step": 1, "label": "Duplicate If Within (Bits of 64)"}),
+
+                # SHOTS (cuts found in the scan pass; best frames picked per shot instead of per page)
+                "selection_scope": (["global", "per_shot"], {"default": "global"}),
+                "frames_per_shot": ("INT", {"default": 1, "min": 1, "max": 1024, "step": 1, "label": "Best Frames per Shot"}),
+                "shot_threshold": ("FLOAT", {"default": 20.0, "min": 1.0, "max": 255.0, "step": 1.0, "label": "Cut If Mean Difference >"}),
+                "min_shot_length": ("INT", {"default": 24, "min": 1, "max": 100000, "step": 1, "label": "Min Shot Length (Frames)"}),
+
+                # INSTRUMENTATION (per-stage timings are always returned; profiling is opt-in)
+                "profile_dir": ("STRING", {"default": "", "label": "cProfile Dump Folder (Empty = Off)"}),
+            },
         }
 
-    RETURN_TYPES = ("IMAGE", "STRING", "INT", "STRING")
-    RETURN_NAMES = ("images", "scores_info", "batch_int", "batch_status")
+    RETURN_TYPES = ("IMAGE", "STRING", "INT", "STRING", "STRING")
+    RETURN_NAMES = ("images", "scores_info", "batch_int", "batch_status", "timings")
     FUNCTION = "load_video"
     CATEGORY = "BetaHelper/Video"
 
-    def calculate_sharpness(self, frame_data):
-        gray = cv2.cvtColor(frame_data, cv2.COLOR_BGR2GRAY)
-        return cv2.Laplacian(gray, cv2.CV_64F).var()
+    def calculate_sharpness(self, frame_data, metric="laplacian", region="full", grid=4, aggregate="max", reject_below=0.0):
+        return score_frame(frame_data, metric, region, grid, aggregate, reject_below)
+
+    def read_frames(self, video_path, indices, keyframes=None):
+        """Decode each index in `indices` (sorted). Returns {idx: BGR frame}.
+
+        Reads follow `_plan_reads`: targets in the same GOP as the reader are reached
+        with grab(), which skips the colour conversion, instead of a fresh seek.
+        """
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = {}
+        position = 0
+        for idx, seek in _plan_reads(indices, keyframes, max(1, round(fps)) if fps > 0 else 24):
+            if seek:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            else:
+                while position < idx and cap.grab():
+                    position += 1
+            ret, frame = cap.read()
+            if ret:
+                frames[idx] = frame
+            position = idx + 1
+        cap.release()
+        return frames
+
+    def make_scanner(self, video_path, fps, width, height, frame_scan_step, scan_threads, decode_backend="opencv",
+                     scan_scale=1.0, keyframes_only=False, sharpness_metric="laplacian", score_region="full", tile_grid=4,
+                     tile_aggregate="max", reject_below=0.0):
+        """Decoder and scorer for one video.
+
+        Returns (samples_fn, score_fn, metric_key, keyframes); keyframes is None
+        unless `keyframes_only` is set and the ffmpeg probe succeeded.
+        """
+        metric = metric_key(sharpness_metric, score_region, tile_grid, tile_aggregate, reject_below)
+        score_fn = functools.partial(self.calculate_sharpness, metric=sharpness_metric, region=score_region,
+                                     grid=tile_grid, aggregate=tile_aggregate, reject_below=reject_below)
+        keyframes = None
+        if decode_backend == "ffmpeg_gray" and fps > 0:
+            if keyframes_only:
+                keyframes = _probe_keyframes(video_path)
+                if keyframes is None:
+                    print("xx- Parallel Loader | Keyframe list unavailable, scanning every Nth frame instead.")
+
+            size = (max(1, round(width * scan_scale)), max(1, round(height * scan_scale)))
+            metric += f"|gray|x{scan_scale:g}"
+            samples_fn = functools.partial(_ffmpeg_samples, video_path, step=frame_scan_step, fps=fps, size=size,
+                                           ring=scan_threads * 2 + 2)
+        else:
+            samples_fn = functools.partial(_opencv_samples, video_path, step=frame_scan_step)
+        return samples_fn, score_fn, metric, keyframes
+
+    def scan_segments(self, video_path, samples_fn, score_fn, runs, frame_scan_step, decode_workers, pool, timings=None):
+        """Scan `runs` with one reader per segment, merging scores back in frame order.
+
+        Each segment is decoded and scored on its own thread (OpenCV and ffmpeg pipes
+        release the GIL while decoding), so throughput scales with the number of
+        decoders instead of being capped by a single reader. Results match the serial path.
+        """
+        segments = _split_runs(runs, frame_scan_step, decode_workers, _probe_keyframes(video_path))
+        print(f"xx- Parallel Loader | Decoding {len(segments)} segments on {decode_workers} decoders.")
+
+        lock = threading.Lock()
+        active = [0]
+
+        def scan(segment):
+            with lock:
+                active[0] += 1
+                if timings is not None:
+                    timings.gauge("scan_segments_active", active[0])
+            try:
+                return _scan_segment(samples_fn([segment]), score_fn, pool, lock)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=decode_workers) as executor:
+            futures = [executor.submit(scan, segment) for segment in segments]
+
+            frame_scores = []
+            for future in futures:
+                frame_scores.extend(future.result())
+
+        return frame_scores
+
+    def scan_frames(self, video_path, wanted, samples_fn, score_fn, index, pool, frame_scan_step, scan_threads, decode_workers,
+                    grid=None, save_index=True, timings=None):
+        """Score every frame in `wanted`, serving what the index knows and decoding the rest.
+
+        `grid` is the sampling sequence `samples_fn` walks (defaults to `wanted`); it
+        decides which missing frames form one contiguous decoder run.
+        Returns (frame_idx, score) pairs sorted by frame index.
+        """
+        if index is not None:
+            frame_scores, missing = index.lookup(wanted)
+            if frame_scores:
+                print(f"xx- Parallel Loader | Score index: {len(frame_scores)} cached, {len(missing)} to decode.")
+        else:
+            frame_scores, missing = [], wanted
+
+        fresh_scores = []
+        if len(missing) > 0:
+            runs = _missing_runs(wanted if grid is None else grid, missing)
+            if decode_workers > 1:
+                fresh_scores = self.scan_segments(video_path, samples_fn, score_fn, runs, frame_scan_step, decode_workers, pool,
+                                                  timings)
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=scan_threads) as executor:
+                    for idx, frame, score in _score_stream(executor, samples_fn(runs), score_fn, scan_threads * 2, timings):
+                        fresh_scores.append((idx, score))
+                        if pool is not None:
+                            pool.offer(idx, score, frame)
+
+        if index is not None and fresh_scores:
+            index.merge(fresh_scores)
+            if save_index:
+                index.save()
 
-    def load_video(self, video_path, batch_index, scan_limit, frame_scan_step, return_count, min_distance, manual_skip_start):
+        frame_scores.extend(fresh_scores)
+        frame_scores.sort(key=lambda x: x[0])
+        return frame_scores
+
+    def select_unique(self, frame_scores, select, hashes, dedup, fetch):
+        """`select(frame_scores)` that skips frames within the dedup radius of the index or of a better pick.
+
+        The index is only read; the saver records the frames it actually writes.
+
+        Skipped frames leave the candidate list (and their `min_distance` zone) and the
+        selection is redone. Picks without a hash (scores served by the score index)
+        are fetched with `fetch(indices) -> {idx: frame}` and hashed.
+        Returns (pairs best first, {idx: fetched frame}, number of frames skipped).
+        """
+        fetched = {}
+        skipped = set()
+        while True:
+            picks = select([pair for pair in frame_scores if pair[0] not in skipped])
+            unknown = [idx for idx, _ in picks if idx not in hashes]
+            if unknown:
+                frames = fetch(sorted(unknown))
+                fetched.update(frames)
+                for idx in unknown:
+                    hashes[idx] = dhash(frames[idx]) if idx in frames else None
+
+            kept = []
+            duplicates = set()
+            for idx, _ in picks:
+                h = hashes[idx]
+                if h is None:
+                    continue
+                if dedup.contains(h) or any(hamming(h, other) <= dedup.radius for other in kept):
+                    duplicates.add(idx)
+                else:
+                    kept.append(h)
+            if not duplicates:
+                return picks, fetched, len(skipped)
+            skipped |= duplicates
+
+    def scan_page(self, video_path, page_start, page_end, samples_fn, score_fn, index, pool, keyframes, frame_scan_step,
+                  scan_threads, decode_workers, scan_strategy, coarse_factor, return_count, min_distance, save_index=True,
+                  timings=None):
+        """Score one page of the sampling grid (frames `page_start` to `page_end`), densely or coarse-to-fine.
+
+        Returns (frame_idx, score) pairs sorted by frame index.
+        """
+        wanted = np.arange(page_start, page_end, frame_scan_step, dtype=np.int64)
+
+        # Stage 1: the whole grid, or only a coarse subset of it when refining later.
+        # Keyframes replace the stride grid; one decoder suffices at that density.
+        # Coarse samples further apart than a GOP are reached by seeking.
+        if keyframes is not None:
+            coarse = np.array([k for k in keyframes if page_start <= k < page_end], dtype=np.int64)
+            frame_scores = self.scan_frames(video_path, coarse, functools.partial(samples_fn, keyframes=keyframes),
+                                            score_fn, index, pool, frame_scan_step, scan_threads, 1,
+                                            save_index=save_index, timings=timings)
+        elif scan_strategy == "coarse_to_fine":
+            coarse_step = frame_scan_step * coarse_factor
+            coarse = wanted[::coarse_factor]
+            frame_scores = self.scan_frames(video_path, coarse, functools.partial(samples_fn, step=coarse_step, seek_keyframes=_probe_keyframes(video_path)),
+                                            score_fn, index, pool, coarse_step, scan_threads, decode_workers,
+                                            save_index=save_index, timings=timings)
+        else:
+            frame_scores = self.scan_frames(video_path, wanted, samples_fn, score_fn, index, pool,
+                                            frame_scan_step, scan_threads, decode_workers,
+                                            save_index=save_index, timings=timings)
+
+        if scan_strategy == "coarse_to_fine" and frame_scores:
+            # Stage 2: densely rescan the neighbourhood of the best coarse hits,
+            # out to the spacing between coarse samples
+            if len(coarse) > 1:
+                radius = int(np.diff(coarse).max())
+            else:
+                radius = coarse_factor * frame_scan_step
+            regions = select_pairs(frame_scores, return_count * 2, max(min_distance, radius))
+            fine = np.unique(np.concatenate([
+                wanted[(wanted >= idx - radius) & (wanted <= idx + radius)] for idx, _ in regions
+            ]))
+            known = np.array([idx for idx, _ in frame_scores], dtype=np.int64)
+            fine = fine[~np.isin(fine, known)]
+            print(f"xx- Parallel Loader | Coarse-to-fine: {len(frame_scores)} coarse samples, "
+                  f"refining {len(regions)} regions ({len(fine)} frames).")
+            if len(fine) > 0:
+                frame_scores = frame_scores + self.scan_frames(video_path, fine, samples_fn, score_fn, index, pool,
+                                                               frame_scan_step, scan_threads, decode_workers, grid=wanted,
+                                                               save_index=save_index, timings=timings)
+                frame_scores.sort(key=lambda x: x[0])
+
+        return frame_scores
+
+    @instrumented("ParallelSharpnessLoader")
+    def load_video(self, video_path, batch_index, scan_limit, frame_scan_step, return_count, min_distance, manual_skip_start,
+                   use_score_index=False, score_index_dir="", single_pass=False, candidate_margin=8,
+                   scan_threads=0, decode_workers=1, decode_backend="opencv", scan_scale=1.0, keyframes_only=False,
+                   scan_strategy="dense", coarse_factor=8, sharpness_metric="laplacian",
+                   score_region="full", tile_grid=4, tile_aggregate="max", reject_below=0.0,
+                   scan_mode="batch", scan_end_frame=0, report_pages=False, output_dtype="float32",
+                   frame_cache_dir="", frame_cache_gb=4.0, dedup_index="", dedup_threshold=6,
+                   selection_scope="global", frames_per_shot=1, shot_threshold=20.0, min_shot_length=24, timings=None):
         
         # 1. Validation
         if not os.path.exists(video_path):
@@ -41,88 +723,207 @@ class ParallelSharpnessLoader:
             raise FileNotFoundError(f"Video not found: {video_path}")
 
         # 2. Calculate Offsets
-        current_skip = (batch_index * scan_limit) + manual_skip_start
+        if scan_mode == "whole_video":
+            # One execution covers the whole range; a re-queued batch just stops the queue
+            if batch_index > 0:
+                raise ValueError(f"Processing Complete. The whole-video scan ran in batch 0; batch {batch_index} has nothing left to scan.")
+            current_skip = manual_skip_start
+        else:
+            current_skip = (batch_index * scan_limit) + manual_skip_start
         range_end = current_skip + scan_limit
-        
-        status_msg = f"Batch {batch_index}: Skipped {current_skip} frames. Scanning range {current_skip} -> {range_end}."
-        print(f"xx- Parallel Loader | {status_msg}")
 
         cap = cv2.VideoCapture(video_path)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        timings.lap("open")
         
         # --- STOP CONDITION 1: REACHED END OF VIDEO ---
         # This stops the queue immediately if we try to read past the end.
         if current_skip >= total_frames:
-             cap.release()
              raise ValueError(f"Processing Complete. Batch {batch_index} starts at frame {current_skip}, but video only has {total_frames} frames.")
 
         # 3. Scanning (Pass 1)
-        if current_skip > 0:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, current_skip)
+        # A page samples `scan_limit` frames, one every `frame_scan_step`. A batch is
+        # one page; the whole-video mode walks every page up to `scan_end_frame`.
+        page_span = scan_limit * frame_scan_step
+        if scan_mode == "whole_video":
+            sample_end = min(scan_end_frame, total_frames) if scan_end_frame > 0 else total_frames
+            range_end = sample_end
+            pages = range(current_skip, sample_end, page_span)
+            status_msg = f"Whole video: Scanning range {current_skip} -> {sample_end} in {len(pages)} pages."
+        else:
+            sample_end = min(current_skip + page_span, total_frames)
+            pages = [current_skip]
+            status_msg = f"Batch {batch_index}: Skipped {current_skip} frames. Scanning range {current_skip} -> {range_end}."
+        print(f"xx- Parallel Loader | {status_msg}")
 
-        frame_scores = [] 
-        current_frame = current_skip
-        scanned_count = 0
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
-            futures = []
-            
-            while True:
-                if scanned_count >= scan_limit:
-                    break
-                
-                ret, frame = cap.read()
-                if not ret: break 
+        if scan_threads == 0:
+            scan_threads = os.cpu_count() or 4
 
-                future = executor.submit(self.calculate_sharpness, frame)
-                futures.append((current_frame, future))
-                scanned_count += 1
-                
-                # Manual Stepping
-                if frame_scan_step > 1:
-                    for _ in range(frame_scan_step - 1):
-                        if not cap.grab(): break
-                        current_frame += 1
-                
-                current_frame += 1
+        per_shot = selection_scope == "per_shot"
+        if per_shot and (scan_strategy != "dense" or keyframes_only or use_score_index):
+            # Cuts are found between consecutive grid samples, which only a dense decode provides
+            print("xx- Parallel Loader | Per-shot selection scans densely, without keyframes or the score index.")
+            scan_strategy, keyframes_only, use_score_index = "dense", False, False
 
-            for idx, future in futures:
-                frame_scores.append((idx, future.result()))
+        if decode_backend == "ffmpeg_gray" and fps > 0 and single_pass:
+            print("xx- Parallel Loader | Single pass needs colour frames; ffmpeg_gray uses the seek pass.")
+            single_pass = False
 
-        cap.release()
+        samples_fn, score_fn, metric, keyframes = self.make_scanner(
+            video_path, fps, width, height, frame_scan_step, scan_threads, decode_backend, scan_scale, keyframes_only,
+            sharpness_metric, score_region, tile_grid, tile_aggregate, reject_below)
+        # Summed over decoder and scoring threads; "scan" below is the wall time of both
+        samples_fn = timings.timed_source("scan_decode", samples_fn)
+        score_fn = timings.timed("scan_score", score_fn)
+        dedup = HashIndex(index_path(dedup_index), dedup_threshold) if dedup_index.strip() else None
+        hashes = {}
+        if dedup is not None:
+            samples_fn = _hashing_source(samples_fn, hashes, timings.timed("scan_hash", dhash))
+        shots = _CutDetector(timings.timed("scan_shots", _thumbnail), shot_threshold) if per_shot else None
+        if shots is not None:
+            samples_fn = shots.source(samples_fn)
+        index = ScoreIndex(video_path, frame_scan_step, metric, score_index_dir) if use_score_index else None
+        pool = CandidatePool(return_count, min_distance, candidate_margin) if single_pass else None
+        # Frames near the index never reach the pool, so its frames go to frames that can win
+        scan_pool = _UniqueOffers(pool, hashes, dedup) if pool is not None and dedup is not None else pool
+
+        # Across pages only the scores that can still win are kept (plus at most
+        # `return_count + candidate_margin` frames in single pass), however long the
+        # movie is. With dedup every pick may be a near-duplicate of a better one, and
+        # any runner-up may replace it, so every score and hash is kept instead (a few
+        # bytes per sample). The index is written once at the end.
+        whole_video = scan_mode == "whole_video"
+        tracker = None
+        if whole_video and dedup is None and per_shot:
+            tracker = ShotPools(frames_per_shot, min_distance, candidate_margin)
+        elif whole_video and dedup is None:
+            tracker = pool if pool is not None else CandidatePool(return_count, min_distance, candidate_margin)
+
+        frame_scores = []
+        page_winners = []
+        scanned = 0
+        try:
+            for page, page_start in enumerate(pages):
+                page_end = min(page_start + page_span, sample_end)
+                page_scores = self.scan_page(video_path, page_start, page_end, samples_fn, score_fn, index, scan_pool, keyframes,
+                                             frame_scan_step, scan_threads, decode_workers, scan_strategy, coarse_factor,
+                                             return_count, min_distance, save_index=not whole_video, timings=timings)
+                scanned += len(page_scores)
+                if shots is not None:
+                    shots.flush()
+                if not whole_video:
+                    frame_scores = page_scores
+                    continue
+
+                if tracker is None:
+                    # Frames near the index can never be returned
+                    frame_scores.extend(pair for pair in page_scores
+                                        if pair[0] not in hashes or not dedup.contains(hashes[pair[0]]))
+                elif per_shot:
+                    tracker.offer_scores(page_scores, shot_starts(shots.cuts, current_skip, min_shot_length))
+                else:
+                    tracker.offer_scores(page_scores)
+                if report_pages and page_scores:
+                    best = sorted(select_pairs(page_scores, return_count, min_distance))
+                    line = f"Page {page} ({page_start}-{page_end}): " + ", ".join(f"F:{idx} (Score:{int(score)})" for idx, score in best)
+                    page_winners.append(line)
+                    print(f"xx- Parallel Loader | {line}")
+        finally:
+            if whole_video and index is not None:
+                index.save()
+
+        timings.lap("scan", frames=scanned)
+        if whole_video:
+            if tracker is not None:
+                frame_scores = tracker.scores()
+            if page_winners:
+                status_msg += "\n" + "\n".join(page_winners)
 
         # 4. Selection
         # --- STOP CONDITION 2: NO FRAMES FOUND ---
         if not frame_scores:
              raise ValueError(f"No frames found in batch {batch_index} (Range {current_skip}-{range_end}). The video might be corrupted or blank.")
 
-        frame_scores.sort(key=lambda x: x[1], reverse=True)
-        selected = []
-        
-        for idx, score in frame_scores:
-            if len(selected) >= return_count: break
-            if all(abs(s[0] - idx) >= min_distance for s in selected):
-                selected.append((idx, score))
+        if per_shot:
+            starts = shot_starts(shots.cuts, current_skip, min_shot_length)
+
+            def select(pairs):
+                return select_per_shot(pairs, starts, frames_per_shot, min_distance, return_count)
+        else:
+            def select(pairs):
+                return select_pairs(pairs, return_count, min_distance)
 
+        fetched = {}
+        if dedup is not None:
+            def fetch(indices):
+                kept = {idx: pool.get(idx) for idx in indices if pool is not None and pool.get(idx) is not None}
+                kept.update(self.read_frames(video_path, [idx for idx in indices if idx not in kept], keyframes))
+                return kept
+
+            selected, fetched, skipped = self.select_unique(frame_scores, select, hashes, dedup, fetch)
+            dedup_msg = f"Dedup: skipped {skipped} near-duplicates ({len(dedup)} frames in {dedup.path})."
+            print(f"xx- Parallel Loader | {dedup_msg}")
+            status_msg += f" {dedup_msg}"
+            if not selected:
+                raise ValueError(f"All frames in batch {batch_index} are near-duplicates of frames already in the dedup index.")
+        else:
+            selected = select(frame_scores)
+        if per_shot:
+            shot_msg = f"Shots: {len(starts)} found, {len(selected)} frames selected."
+            print(f"xx- Parallel Loader | {shot_msg}")
+            status_msg += f" {shot_msg}"
         selected.sort(key=lambda x: x[0])
+        timings.lap("select", frames=len(frame_scores))
 
-        # 5. Extraction (Pass 2)
-        cap = cv2.VideoCapture(video_path)
-        output_tensors = []
+        # 5. Extraction
+        # Single pass serves frames kept during the scan; only misses (cached scores,
+        # rare candidate evictions) fall back to the seek-based second pass.
+        frames = {idx: fetched[idx] for idx, _ in selected if idx in fetched}
+        if pool is not None:
+            for idx, _ in selected:
+                frame = pool.get(idx)
+                if frame is not None:
+                    frames[idx] = frame
+        misses = [idx for idx, _ in selected if idx not in frames]
+        if pool is not None:
+            print(f"xx- Parallel Loader | Single pass: {len(frames)} frames kept from scan, {len(misses)} re-decoded.")
+
+        # The frame cache serves memory-mapped frames from earlier runs; only the
+        # rest is decoded, and then stored for the next run
+        cache = FrameCache(frame_cache_dir, int(frame_cache_gb * 1024 ** 3)) if frame_cache_dir else None
+        if cache is not None and misses:
+            cached = cache.get_many(video_path, misses)
+            print(f"xx- Parallel Loader | Frame cache: {len(cached)} of {len(misses)} frames cached.")
+            frames.update(cached)
+            misses = [idx for idx in misses if idx not in cached]
+            timings.lap("extract_cache", frames=len(cached))
+        if misses:
+            if keyframes is None:
+                keyframes = _keyframes_for_reads(video_path, len(misses), total_frames)
+            decoded = self.read_frames(video_path, misses, keyframes)
+            frames.update(decoded)
+            timings.lap("extract_decode", frames=len(decoded))
+            if cache is not None:
+                cache.put_many(video_path, decoded)
+                timings.lap("extract_cache_store", frames=len(decoded))
+        pool = None
+
+        output_frames = []
         info_log = []
 
         for idx, score in selected:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame = frame.astype(np.float32) / 255.0
-                output_tensors.append(torch.from_numpy(frame))
+            frame = frames.get(idx)
+            if frame is not None:
+                output_frames.append(frame)
                 info_log.append(f"F:{idx} (Score:{int(score)})")
-        
-        cap.release()
 
-        if not output_tensors:
+        if not output_frames:
              raise ValueError("Frames were selected but could not be loaded. This indicates a file read error.")
 
-        return (torch.stack(output_tensors), ", ".join(info_log), batch_index, status_msg)
\ No newline at end of file
+        images = _to_image_batch(output_frames, output_dtype)
+        timings.lap("to_tensor", frames=len(output_frames), nbytes=images.element_size() * images.nelement())
+        return (images, ", ".join(info_log), batch_index, status_msg)
\ No newline at end of file
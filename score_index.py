@@ -0,0 +1,92 @@
+import os
+import hashlib
+import numpy as np
+
+# Bump when the on-disk layout or the meaning of a score changes.
+INDEX_VERSION = 1
+INDEX_DTYPE = np.dtype([("frame", "<i8"), ("score", "<f8")])
+
+
+def video_identity(video_path):
+    """Path, size and mtime of a video: changes whenever the file is replaced or edited."""
+    video_path = os.path.abspath(video_path)
+    st = os.stat(video_path)
+    return "|".join([os.path.normcase(video_path), str(st.st_size), str(st.st_mtime_ns)])
+
+
+class ScoreIndex:
+    """On-disk (frame_idx, score) table for one video / scan step / metric.
+
+    The table lives in a small `.npy` sidecar next to the video (or in `index_dir`)
+    and is opened memory-mapped, so looking up a page of a 2-hour movie does not
+    read the whole file. The file name embeds a hash of the video identity (path,
+    size, mtime), the scan step and the metric: editing the video or changing
+    either setting simply points at a different sidecar.
+    """
+
+    def __init__(self, video_path, frame_scan_step, metric, index_dir=""):
+        video_path = os.path.abspath(video_path)
+        key = "|".join([str(INDEX_VERSION), video_identity(video_path), str(frame_scan_step), metric])
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        folder = index_dir.strip('"') if index_dir else os.path.dirname(video_path)
+        self.path = os.path.join(folder, f".{os.path.basename(video_path)}.{digest}.sharpidx.npy")
+        self._table = self._load()
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._table)
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        try:
+            table = np.load(self.path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"xx- Score Index | Ignoring unreadable index {self.path}: {e}")
+            return np.empty(0, dtype=INDEX_DTYPE)
+        if table.dtype != INDEX_DTYPE or table.ndim != 1:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return table
+
+    def lookup(self, frames):
+        """Split `frames` (sorted ints) into indexed (frame, score) pairs and missing frames."""
+        frames = np.asarray(frames, dtype=np.int64)
+        known = self._table["frame"]
+        pos = np.searchsorted(known, frames)
+        hit = pos < len(known)
+        hit[hit] = known[pos[hit]] == frames[hit]
+        scores = self._table["score"][pos[hit]]
+        found = list(zip(frames[hit].tolist(), np.asarray(scores, dtype=np.float64).tolist()))
+        return found, frames[~hit]
+
+    def merge(self, frame_scores):
+        """Add freshly scored (frame, score) pairs. Newer scores win over stored ones."""
+        if not frame_scores:
+            return
+        fresh = np.array(frame_scores, dtype=INDEX_DTYPE)
+        table = np.concatenate([fresh, np.asarray(self._table)])
+        # np.unique keeps the first occurrence, which is the fresh entry
+        _, first = np.unique(table["frame"], return_index=True)
+        self._table = table[first]
+        self._dirty = True
+
+    def save(self):
+        """Write the table if anything was merged since it was loaded or last saved."""
+        if not self._dirty:
+            return True
+        # Held in memory from here on: a mapped file cannot be replaced on Windows
+        self._table = np.array(self._table)
+        tmp_path = self.path + ".tmp.npy"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            np.save(tmp_path, self._table)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            return True
+        except OSError as e:
+            print(f"xx- Score Index | Could not write {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
@@ -1,26 +1,53 @@
 import torch
 import numpy as np
 import cv2
+from .frame_selection import best_per_block, select_min_distance
+from .sharpness_metrics import METRICS, REGIONS, AGGREGATES, score_gray, score_image_batch
+from .instrumentation import instrumented
 
-# --- NODE 1: ANALYZER (Unchanged) ---
+# --- NODE 1: ANALYZER ---
 class SharpnessAnalyzer:
     @classmethod
     def INPUT_TYPES(s):
-        return {"required": {"images": ("IMAGE",)}}
+        return {
+            "required": {"images": ("IMAGE",)},
+            "optional": {
+                "metric": (METRICS, {"default": "laplacian"}),
+                "score_region": (REGIONS, {"default": "full"}),
+                "tile_grid": ("INT", {"default": 4, "min": 2, "max": 16, "step": 1, "label": "Tiles per Side"}),
+                "tile_aggregate": (AGGREGATES, {"default": "max"}),
+                "reject_below": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 100000.0, "step": 1.0, "label": "Early Reject (Quick Score <)"}),
+                # auto/torch/opencv score whole chunks without a uint8 round trip; legacy is the original per-frame path
+                "engine": (["auto", "torch", "opencv", "legacy"], {"default": "auto"}),
+                "chunk_size": ("INT", {"default": 32, "min": 1, "max": 4096, "step": 1, "label": "Frames per Chunk"}),
+                "profile_dir": ("STRING", {"default": "", "label": "cProfile Dump Folder (Empty = Off)"}),
+            },
+        }
     
-    RETURN_TYPES = ("SHARPNESS_SCORES",)
-    RETURN_NAMES = ("scores",)
+    RETURN_TYPES = ("SHARPNESS_SCORES", "STRING")
+    RETURN_NAMES = ("scores", "timings")
     FUNCTION = "analyze_sharpness"
     CATEGORY = "SharpFrames"
 
-    def analyze_sharpness(self, images):
+    @instrumented("SharpnessAnalyzer")
+    def analyze_sharpness(self, images, metric="laplacian", engine="auto", chunk_size=32,
+                          score_region="full", tile_grid=4, tile_aggregate="max", reject_below=0.0, timings=None):
         print(f"[SharpAnalyzer] Calculating scores for {len(images)} frames...")
+        if engine != "legacy":
+            scores = score_image_batch(images, metric, chunk_size, engine,
+                                       score_region, tile_grid, tile_aggregate, reject_below)
+            timings.lap(f"score_{engine}", frames=len(images))
+            return (scores,)
+
         scores = []
         for i in range(len(images)):
-            img_np = (images[i].cpu().numpy() * 255).astype(np.uint8)
+            img_np = images[i].cpu().numpy()
+            if img_np.dtype != np.uint8:
+                img_np = (img_np * 255).astype(np.uint8)
             gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
-            score = cv2.Laplacian(gray, cv2.CV_64F).var()
+            score = score_gray(gray, metric, score_region, tile_grid, tile_aggregate, reject_below)
             scores.append(score)
+        timings.lap("score_legacy", frames=len(images))
         return (scores,)
 
 # --- NODE 2: SELECTOR (Updated with Buffer) ---
@@ -37,53 +64,47 @@ class SharpFrameSelector:
                 "batch_buffer": ("INT", {"default": 0, "min": 0, "max": 10000, "step": 1}), 
                 "num_frames": ("INT", {"default": 10, "min": 1, "max": 10000, "step": 1}),
                 "min_sharpness": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 10000.0, "step": 0.1}),
-            }
+            },
+            "optional": {
+                # Minimum gap (in frames) between any two selected frames
+                "min_distance": ("INT", {"default": 0, "min": 0, "max": 10000, "step": 1}),
+                "profile_dir": ("STRING", {"default": "", "label": "cProfile Dump Folder (Empty = Off)"}),
+            },
         }
 
-    RETURN_TYPES = ("IMAGE", "INT")
-    RETURN_NAMES = ("selected_images", "count")
+    RETURN_TYPES = ("IMAGE", "INT", "STRING")
+    RETURN_NAMES = ("selected_images", "count", "timings")
     FUNCTION = "select_frames"
     CATEGORY = "SharpFrames"
     
-    def select_frames(self, images, scores, selection_method, batch_size, batch_buffer, num_frames, min_sharpness):
+    @instrumented("SharpFrameSelector")
+    def select_frames(self, images, scores, selection_method, batch_size, batch_buffer, num_frames, min_sharpness, min_distance=0,
+                      timings=None):
         if len(images) != len(scores):
             min_len = min(len(images), len(scores))
             images = images[:min_len]
             scores = scores[:min_len]
 
+        scores = np.asarray(scores, dtype=np.float64)
         selected_indices = []
 
         if selection_method == "batched":
-            total_frames = len(scores)
-            
-            # THE FIX: Step includes the buffer size
-            # If batch=24 and buffer=2, we jump 26 frames each time
-            step_size = batch_size + batch_buffer
-            
-            for i in range(0, total_frames, step_size):
-                # The chunk is strictly the batch_size
-                chunk_end = min(i + batch_size, total_frames)
-                chunk_scores = scores[i : chunk_end]
-                
-                if len(chunk_scores) > 0:
-                    best_in_chunk_idx = np.argmax(chunk_scores)
-                    best_score = chunk_scores[best_in_chunk_idx]
-                    
-                    if best_score >= min_sharpness:
-                        selected_indices.append(i + best_in_chunk_idx)
-                
+            # The step includes the buffer size: with batch=24 and buffer=2 we jump
+            # 26 frames each time, but only the first 24 of each step compete
+            positions, best_scores = best_per_block(scores, batch_size, batch_buffer)
+            positions = positions[best_scores >= min_sharpness]
+            if min_distance > 0:
+                positions = positions[select_min_distance(positions, scores[positions], len(positions), min_distance)]
+            selected_indices = sorted(positions.tolist())
+
         elif selection_method == "best_n":
-            # (Logic remains the same, buffer applies to Batched only)
-            valid_indices = [i for i, s in enumerate(scores) if s >= min_sharpness]
-            valid_scores = np.array([scores[i] for i in valid_indices])
-            
-            if len(valid_scores) > 0:
-                target_count = min(num_frames, len(valid_scores))
-                top_local_indices = np.argsort(valid_scores)[-target_count:]
-                top_global_indices = [valid_indices[i] for i in top_local_indices]
-                selected_indices = sorted(top_global_indices)
+            # (Buffer applies to Batched only)
+            valid_indices = np.flatnonzero(scores >= min_sharpness)
+            picked = select_min_distance(valid_indices, scores[valid_indices], num_frames, min_distance)
+            selected_indices = sorted(valid_indices[picked].tolist())
 
         print(f"[SharpSelector] Selected {len(selected_indices)} frames.")
+        timings.lap("select", frames=len(scores))
         
         if len(selected_indices) == 0:
             h, w = images[0].shape[0], images[0].shape[1]
@@ -91,4 +112,6 @@ class SharpFrameSelector:
             return (empty, 0)
 
         result_images = images[selected_indices]
+        timings.lap("gather", frames=len(selected_indices),
+                    nbytes=result_images.element_size() * result_images.nelement())
         return (result_images, len(selected_indices))
\ No newline at end of file
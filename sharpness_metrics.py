@@ -0,0 +1,246 @@
+import math
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+# Shared sharpness metrics for the loader (uint8 BGR/gray numpy frames) and the
+# analyzer (float IMAGE tensors), so both nodes score frames the same way.
+#
+#   laplacian       Laplacian variance at full resolution (the original score).
+#   laplacian_int   Same value, accumulated in int16 instead of float64 (faster).
+#   laplacian_norm  Laplacian variance at the reference resolution.
+#   tenengrad_norm  Mean squared Sobel gradient at the reference resolution.
+#
+# The *_norm metrics first area-resample the frame to REFERENCE_PIXELS, so their
+# values do not depend on the source resolution:
+# a threshold tuned on 1080p carries over to 4K or 512px generations, and 4K
+# frames are scored at a fraction of the full-resolution cost.
+#
+# Any metric can be taken over the whole frame, a centre ROI (the middle half in
+# each direction) or a grid of tiles aggregated by max / mean of the best quarter.
+# Tiles stop a sharp subject on a bokeh background from scoring as blurry. With
+# `reject_below`, a cheap quarter-resolution Laplacian variance is computed first
+# and frames under it score 0 without running the full-resolution metric.
+METRICS = ["laplacian", "laplacian_int", "laplacian_norm", "tenengrad_norm"]
+REGIONS = ["full", "center", "tiles"]
+AGGREGATES = ["max", "top_quarter_mean"]
+REFERENCE_PIXELS = 1280 * 720
+
+# cv2.COLOR_RGB2GRAY weights
+_GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def reference_size(height, width):
+    """(height, width) with the frame's aspect ratio and REFERENCE_PIXELS area."""
+    scale = math.sqrt(REFERENCE_PIXELS / float(height * width))
+    return max(3, round(height * scale)), max(3, round(width * scale))
+
+
+def to_reference(gray):
+    """Resample a 2-D gray frame to the reference resolution.
+
+    Reductions use pixel-area averaging (cv2.INTER_AREA), which anti-aliases the
+    way a camera sensor at that resolution would; enlargements are bilinear.
+    """
+    h, w = gray.shape[:2]
+    ref_h, ref_w = reference_size(h, w)
+    if (ref_h, ref_w) == (h, w):
+        return gray
+    interp = cv2.INTER_AREA if ref_h * ref_w < h * w else cv2.INTER_LINEAR
+    return cv2.resize(gray, (ref_w, ref_h), interpolation=interp)
+
+
+def _area_weights(src, dst, dtype, device):
+    """(dst, src) matrix averaging each output cell over the input pixels it covers."""
+    edges = torch.arange(dst + 1, dtype=torch.float64) * (src / dst)
+    lo, hi = edges[:-1, None], edges[1:, None]
+    pixels = torch.arange(src, dtype=torch.float64)[None, :]
+    overlap = (torch.minimum(hi, pixels + 1) - torch.maximum(lo, pixels)).clamp_(min=0)
+    return (overlap / (src / dst)).to(dtype=dtype, device=device)
+
+
+def _resize_torch(gray, size):
+    """Batched cv2.resize of a (B, 1, H, W) float tensor: area when reducing, else bilinear."""
+    h, w = gray.shape[-2:]
+    if tuple(size) == (h, w):
+        return gray
+    if size[0] * size[1] >= h * w:
+        return F.interpolate(gray, size=size, mode="bilinear", align_corners=False)
+    # Area averaging is separable: rows then columns
+    rows = _area_weights(h, size[0], gray.dtype, gray.device)
+    cols = _area_weights(w, size[1], gray.dtype, gray.device)
+    return torch.matmul(torch.matmul(rows, gray), cols.T)
+
+
+def _quick_size(height, width):
+    return max(3, height // 4), max(3, width // 4)
+
+
+def quick_score(gray):
+    """Laplacian variance at quarter resolution, used for early rejection."""
+    h, w = gray.shape[:2]
+    small_h, small_w = _quick_size(h, w)
+    small = cv2.resize(gray, (small_w, small_h), interpolation=cv2.INTER_AREA)
+    return _variance(cv2.Laplacian(small, cv2.CV_16S if small.dtype == np.uint8 else cv2.CV_32F))
+
+
+def metric_key(metric, region="full", grid=4, aggregate="max", reject_below=0.0):
+    """Stable description of a scoring setup, e.g. for cache keys."""
+    key = metric
+    if region == "tiles":
+        key += f"|tiles{grid}-{aggregate}"
+    elif region != "full":
+        key += f"|{region}"
+    if reject_below > 0:
+        key += f"|reject{reject_below:g}"
+    return key
+
+
+def _cells(height, width, region, grid):
+    """(y0, y1, x0, x1) bounds of the areas a region is scored over."""
+    if region == "center":
+        return [(height // 4, height - height // 4, width // 4, width - width // 4)]
+    if region == "tiles":
+        ys = [i * height // grid for i in range(grid + 1)]
+        xs = [i * width // grid for i in range(grid + 1)]
+        return [(ys[i], ys[i + 1], xs[j], xs[j + 1]) for i in range(grid) for j in range(grid)]
+    return [(0, height, 0, width)]
+
+
+def _variance(values):
+    _, std = cv2.meanStdDev(values)
+    return float(std[0, 0]) ** 2
+
+
+def _mean_square(values):
+    mean, std = cv2.meanStdDev(values)
+    return float(std[0, 0]) ** 2 + float(mean[0, 0]) ** 2
+
+
+def _aggregate(values, aggregate):
+    if len(values) == 1:
+        return values[0]
+    if aggregate == "max":
+        return max(values)
+    best = sorted(values, reverse=True)[:max(1, len(values) // 4)]
+    return sum(best) / len(best)
+
+
+def score_gray(gray, metric="laplacian", region="full", grid=4, aggregate="max", reject_below=0.0):
+    """Score a 2-D gray frame: uint8, or float32 on a 0-255 scale."""
+    if reject_below > 0 and quick_score(gray) < reject_below:
+        return 0.0
+
+    if metric not in METRICS:
+        raise ValueError(f"Unknown sharpness metric: {metric}")
+    if metric == "laplacian" and gray.dtype == np.uint8 and region == "full":
+        # The original score, bit for bit
+        return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    if metric.endswith("_norm"):
+        gray = to_reference(gray)
+    # int16 holds any 3x3 Laplacian/Sobel response of uint8 input exactly
+    depth = cv2.CV_16S if gray.dtype == np.uint8 else cv2.CV_32F
+
+    if metric == "tenengrad_norm":
+        maps, stat = (cv2.Sobel(gray, depth, 1, 0), cv2.Sobel(gray, depth, 0, 1)), _mean_square
+    else:
+        maps, stat = (cv2.Laplacian(gray, depth),), _variance
+
+    h, w = gray.shape[:2]
+    values = [sum(stat(m[y0:y1, x0:x1]) for m in maps) for y0, y1, x0, x1 in _cells(h, w, region, grid)]
+    return _aggregate(values, aggregate)
+
+
+def score_frame(frame, metric="laplacian", region="full", grid=4, aggregate="max", reject_below=0.0):
+    """Score a decoded video frame (uint8 BGR, or gray from the ffmpeg_gray backend)."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return score_gray(gray, metric, region, grid, aggregate, reject_below)
+
+
+def _laplacian_torch(gray):
+    # "reflect" is OpenCV's default BORDER_REFLECT_101; shifted sums are much
+    # cheaper than conv2d for these 3x3 kernels
+    g = F.pad(gray, (1, 1, 1, 1), mode="reflect")
+    return (g[:, :, 1:-1, :-2] + g[:, :, 1:-1, 2:] + g[:, :, :-2, 1:-1] + g[:, :, 2:, 1:-1]
+            - 4.0 * g[:, :, 1:-1, 1:-1])
+
+
+def _sobel_torch(gray):
+    g = F.pad(gray, (1, 1, 1, 1), mode="reflect")
+    dx = g[:, :, :, 2:] - g[:, :, :, :-2]
+    dy = g[:, :, 2:, :] - g[:, :, :-2, :]
+    gx = dx[:, :, :-2] + 2.0 * dx[:, :, 1:-1] + dx[:, :, 2:]
+    gy = dy[:, :, :, :-2] + 2.0 * dy[:, :, :, 1:-1] + dy[:, :, :, 2:]
+    return gx, gy
+
+
+def _score_gray_torch(gray, metric, region="full", grid=4, aggregate="max", reject_below=0.0):
+    """Batched torch version of `score_gray` for a (B, 1, H, W) float tensor on a 0-255 scale."""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown sharpness metric: {metric}")
+
+    rejected = None
+    if reject_below > 0:
+        small = _resize_torch(gray, _quick_size(*gray.shape[-2:]))
+        rejected = _laplacian_torch(small).flatten(1).var(dim=1, unbiased=False) < reject_below
+
+    if metric.endswith("_norm"):
+        gray = _resize_torch(gray, reference_size(*gray.shape[-2:]))
+
+    if metric == "tenengrad_norm":
+        maps = _sobel_torch(gray)
+        stat = lambda m: m.square().flatten(1).mean(dim=1)
+    else:
+        maps = (_laplacian_torch(gray),)
+        stat = lambda m: m.flatten(1).var(dim=1, unbiased=False)
+
+    h, w = gray.shape[-2:]
+    values = torch.stack([sum(stat(m[:, :, y0:y1, x0:x1]) for m in maps)
+                          for y0, y1, x0, x1 in _cells(h, w, region, grid)], dim=1)
+    if values.shape[1] == 1:
+        scores = values[:, 0]
+    elif aggregate == "max":
+        scores = values.max(dim=1).values
+    else:
+        scores = values.topk(max(1, values.shape[1] // 4), dim=1).values.mean(dim=1)
+
+    if rejected is not None:
+        scores = scores.masked_fill(rejected, 0.0)
+    return scores
+
+
+def score_image_batch(images, metric="laplacian", chunk_size=32, engine="auto",
+                      region="full", grid=4, aggregate="max", reject_below=0.0):
+    """Score every frame of an IMAGE batch, `chunk_size` frames at a time.
+
+    "torch" computes gray, the filter response and the statistic for a whole chunk
+    with tensor ops on the images' own device; "auto" uses it for GPU tensors and
+    otherwise runs the OpenCV kernels over zero-copy float views of each CPU chunk,
+    which beats torch on CPU. Neither path rounds gray to uint8 like the original
+    per-frame code did. That rounding adds quantisation noise, so "laplacian"
+    scores of the legacy path sit a near-constant ~2.5 above these: under 1% for
+    any score above ~250.
+    """
+    if engine == "auto":
+        engine = "opencv" if images.device.type == "cpu" else "torch"
+    # uint8 batches (the loader's output_dtype=uint8) are already on a 0-255 scale
+    scale = 1.0 if images.dtype == torch.uint8 else 255.0
+
+    scores = []
+    with torch.no_grad():
+        weights = torch.tensor(_GRAY_WEIGHTS, dtype=torch.float32, device=images.device) * scale
+        for start in range(0, len(images), chunk_size):
+            chunk = images[start:start + chunk_size, :, :, :3]
+
+            if engine == "torch":
+                gray = torch.matmul(chunk.to(torch.float32), weights).unsqueeze(1)
+                scores.extend(_score_gray_torch(gray, metric, region, grid, aggregate, reject_below).tolist())
+            else:
+                for frame in chunk.to(device="cpu", dtype=torch.float32).numpy():
+                    gray = cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2GRAY)
+                    if scale != 1.0:
+                        np.multiply(gray, scale, out=gray)
+                    scores.append(float(score_gray(gray, metric, region, grid, aggregate, reject_below)))
+    return scores
@@ -0,0 +1,13 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The node pack uses relative imports: load it as a package, the way ComfyUI does
+if "sharpness_nodes" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("sharpness_nodes", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
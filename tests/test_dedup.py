@@ -0,0 +1,64 @@
+import os
+import re
+
+import cv2
+import numpy as np
+import pytest
+
+from sharpness_nodes.dedup_index import DEDUP_FILE
+from sharpness_nodes.fast_saver import FastAbsoluteSaver
+from sharpness_nodes.parallel_loader import ParallelSharpnessLoader
+
+SHOT_LENGTH = 40
+SHOTS = 8
+RETURN_COUNT = 3
+
+
+@pytest.fixture(scope="module")
+def still_shots_video(tmp_path_factory):
+    """Eight 40-frame still shots of distinct textures, each blurrier than the one before.
+
+    Every frame of a shot is a near-duplicate of the others, so each shot can give
+    one frame per run.
+    """
+    path = str(tmp_path_factory.mktemp("still") / "still.mp4")
+    rng = np.random.default_rng(1)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 24, (320, 240))
+    for shot in range(SHOTS):
+        base = cv2.resize((rng.random((24, 32, 3)) * 255).astype(np.uint8), (320, 240), interpolation=cv2.INTER_CUBIC)
+        noise = np.repeat((rng.random((240, 320, 1)) * 80).astype(np.uint8), 3, axis=2)
+        frame = cv2.GaussianBlur(cv2.add(base, noise), (0, 0), 0.5 + shot * 0.6)
+        for _ in range(SHOT_LENGTH):
+            writer.write(frame)
+    writer.release()
+    return path
+
+
+def picked_shots(video_path, dedup_folder, scan_limit=SHOT_LENGTH * SHOTS, **kwargs):
+    """Shots of the frames one dense run returns, their number, and the returned images."""
+    result = ParallelSharpnessLoader().load_video(video_path, 0, scan_limit, 1, RETURN_COUNT, 1, 0,
+                                                  dedup_index=dedup_folder, **kwargs)
+    frames = [int(idx) for idx in re.findall(r"F:(\d+)", result[1])]
+    return sorted({idx // SHOT_LENGTH for idx in frames}), len(frames), result[0]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"scan_mode": "whole_video", "scan_limit": SHOT_LENGTH},
+    {"scan_mode": "whole_video", "scan_limit": SHOT_LENGTH, "single_pass": True},
+])
+def test_runs_skip_saved_frames(still_shots_video, tmp_path, kwargs):
+    folder = str(tmp_path)
+    index_file = os.path.join(folder, DEDUP_FILE)
+    seen = []
+    for run in range(2):
+        before = open(index_file, "rb").read() if os.path.exists(index_file) else None
+        shots, count, images = picked_shots(still_shots_video, folder, **kwargs)
+        # The loader only reads the index; the saver records what it writes
+        assert (open(index_file, "rb").read() if os.path.exists(index_file) else None) == before
+        # Near-duplicates within the run are replaced by the next best shots
+        assert count == RETURN_COUNT and len(shots) == RETURN_COUNT
+        assert not set(shots) & set(seen)
+        assert shots == list(range(run * RETURN_COUNT, (run + 1) * RETURN_COUNT))
+        FastAbsoluteSaver().unique_positions(images, folder, 6)
+        seen += shots
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from sharpness_nodes.frame_selection import CandidatePool, select_pairs
+
+
+def test_knocked_out_picks_are_refilled():
+    pool = CandidatePool(2, 15, 0)
+    for page in ([(40, 10), (60, 5)], [(200, 4)], [(50, 20)]):
+        pool.offer_scores(page)
+    assert select_pairs(pool.scores(), 2, 15) == [(50, 20), (200, 4)]
+
+
+@pytest.mark.parametrize("with_frames", [False, True])
+def test_pool_matches_exact_selection(with_frames):
+    for seed in range(500):
+        rng = random.Random(seed)
+        count = rng.randint(1, 6)
+        min_distance = rng.choice([0, 1, 2, 5, 15, 40])
+        margin = rng.randint(0, 4)
+        n = rng.randint(1, 300)
+        # Integer scores make ties common, so tie order is checked too
+        pairs = [(idx, float(rng.randint(0, 50) if rng.random() < 0.5 else rng.random() * 100))
+                 for idx in rng.sample(range(n * 3), n)]
+
+        pool = CandidatePool(count, min_distance, margin)
+        for start in range(0, n, 37):
+            page = sorted(pairs[start:start + 37])
+            if with_frames:
+                for idx, score in page:
+                    pool.offer(idx, score, object())
+            else:
+                pool.offer_scores(page)
+
+        expected = select_pairs(sorted(pairs), count, min_distance)
+        assert select_pairs(pool.scores(), count, min_distance) == expected, seed
+        assert sum(pool.get(idx) is not None for idx, _ in pool.scores()) <= count + margin
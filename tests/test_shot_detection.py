@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+import pytest
+
+import sharpness_nodes.parallel_loader as parallel_loader
+from sharpness_nodes.parallel_loader import ParallelSharpnessLoader
+
+SHOT_LENGTH = 50
+SHOTS = 5
+
+
+@pytest.fixture(scope="module")
+def shots_video(tmp_path_factory):
+    """Five 50-frame shots of distinct textures, each panning slowly."""
+    path = str(tmp_path_factory.mktemp("shots") / "shots.mp4")
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 24, (320, 240))
+    for shot in range(SHOTS):
+        base = cv2.resize((rng.random((24, 40, 3)) * 255).astype(np.uint8), (400, 240), interpolation=cv2.INTER_CUBIC)
+        for i in range(SHOT_LENGTH):
+            writer.write(np.ascontiguousarray(base[:, i:i + 320]))
+    writer.release()
+    return path
+
+
+def shots_found(video_path, scan_limit=SHOT_LENGTH * SHOTS, **kwargs):
+    """Number of shots the loader reports for a dense per-shot scan of the whole clip."""
+    result = ParallelSharpnessLoader().load_video(video_path, 0, scan_limit, 1, SHOTS * 2, 0, 0, use_score_index=False,
+                                                  selection_scope="per_shot", **kwargs)
+    return int(result[3].split("Shots: ")[1].split()[0])
+
+
+def test_single_reader_finds_every_cut(shots_video):
+    assert shots_found(shots_video) == SHOTS
+
+
+def test_cut_on_segment_boundary(shots_video, monkeypatch):
+    # Keyframes on every cut, as encoders place them: each decoder segment starts on a cut
+    keyframes = list(range(0, SHOT_LENGTH * SHOTS, SHOT_LENGTH))
+    monkeypatch.setattr(parallel_loader, "_probe_keyframes", lambda video_path: keyframes)
+    assert shots_found(shots_video, decode_workers=SHOTS) == SHOTS
+
+
+def test_cut_on_page_boundary(shots_video):
+    # One page per shot: each page starts on a cut
+    assert shots_found(shots_video, scan_limit=SHOT_LENGTH, scan_mode="whole_video") == SHOTS